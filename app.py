@@ -1,22 +1,62 @@
 import os
 from flask import Flask, render_template
 from models import db
+from models.engine import database_url, engine_options, install_sqlite_pragmas
 from models.user import User
 from models.bot import Bot
 from models.rule import Rule
 from models.message_log import MessageLog
+from models.message_rollup import MessageRollup, RollupSender
+from models.bot_sender import BotSender
+from models.broadcast import Broadcast, BroadcastRecipient
+from models.rate_limit import RateLimitBucket
+from models.processed_message import ProcessedMessage
+from models.migrations import init_db
+from services.dispatcher import dispatcher
+from services.log_writer import log_writer
+from services.metrics import metrics
+from services.broadcast import broadcast_runner
 
 def create_app():
     app = Flask(__name__)
     
     app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///whatsapp_bot.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['OUTBOUND_ASYNC'] = os.environ.get('OUTBOUND_ASYNC', '1') == '1'
+    app.config['OUTBOUND_WORKERS'] = int(os.environ.get('OUTBOUND_WORKERS', 4))
+    app.config['OUTBOUND_QUEUE_SIZE'] = int(os.environ.get('OUTBOUND_QUEUE_SIZE', 1000))
+    app.config['MESSAGE_LOG_WRITE_BEHIND'] = os.environ.get('MESSAGE_LOG_WRITE_BEHIND', '0') == '1'
+    app.config['MESSAGE_LOG_BATCH_SIZE'] = int(os.environ.get('MESSAGE_LOG_BATCH_SIZE', 500))
+    app.config['MESSAGE_LOG_FLUSH_INTERVAL'] = float(os.environ.get('MESSAGE_LOG_FLUSH_INTERVAL', 1.0))
+    app.config['MESSAGE_LOG_MAX_PENDING'] = int(os.environ.get('MESSAGE_LOG_MAX_PENDING', 50000))
+    retention_days = os.environ.get('MESSAGE_LOG_RETENTION_DAYS')
+    app.config['MESSAGE_LOG_RETENTION_DAYS'] = int(retention_days) if retention_days else None
+    app.config['MESSAGE_LOG_ARCHIVE_DIR'] = os.environ.get('MESSAGE_LOG_ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['BROADCAST_WORKERS'] = int(os.environ.get('BROADCAST_WORKERS', 8))
+    app.config['BROADCAST_BATCH_SIZE'] = int(os.environ.get('BROADCAST_BATCH_SIZE', 500))
+    app.config['BROADCAST_MAX_RECIPIENTS'] = int(os.environ.get('BROADCAST_MAX_RECIPIENTS', 10000))
+    app.config['BROADCAST_RETRY_DELAY'] = float(os.environ.get('BROADCAST_RETRY_DELAY', 30))
+    app.config['DEDUP_RETENTION_HOURS'] = int(os.environ.get('DEDUP_RETENTION_HOURS', 72))
+    # Create tables and run migrations in create_app, for local runs and
+    # tests. Deployments run `flask db upgrade` or let gunicorn.conf.py do it.
+    app.config['DB_AUTO_INIT'] = os.environ.get('DB_AUTO_INIT', '0') == '1'
+    app.config['API_BATCH_MAX_MESSAGES'] = int(os.environ.get('API_BATCH_MAX_MESSAGES', 50000))
     
     db.init_app(app)
+    dispatcher.init_app(app)
+    log_writer.init_app(app)
+    metrics.init_app(app)
+    broadcast_runner.init_app(app)
     
     with app.app_context():
-        db.create_all()
+        install_sqlite_pragmas(db.engine)
+        if app.config['DB_AUTO_INIT']:
+            init_db()
     
     from routes.auth import auth_bp
     from routes.bots import bots_bp
@@ -24,6 +64,8 @@ def create_app():
     from routes.analytics import analytics_bp
     from routes.whatsapp import whatsapp_bp
     from routes.settings import settings_bp
+    from routes.metrics import metrics_bp
+    from routes.broadcasts import broadcasts_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(bots_bp)
@@ -31,6 +73,14 @@ def create_app():
     app.register_blueprint(analytics_bp)
     app.register_blueprint(whatsapp_bp)
     app.register_blueprint(settings_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(broadcasts_bp)
+    
+    from commands import broadcasts_cli, db_cli, logs_cli, rollups_cli
+    app.cli.add_command(broadcasts_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(logs_cli)
+    app.cli.add_command(rollups_cli)
     
     @app.route('/static/manifest.webmanifest')
     def manifest():
@@ -39,5 +89,6 @@ def create_app():
     return app
 
 if __name__ == '__main__':
+    os.environ.setdefault('DB_AUTO_INIT', '1')
     app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=True)
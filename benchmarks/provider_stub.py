@@ -0,0 +1,163 @@
+"""A local stand-in for the Meta Graph messages API.
+
+It answers ``POST .../messages`` like Graph does. A configurable share of
+requests can fail with 429 (with Retry-After) or 503, and every response can
+be delayed. Point the app at it with ``META_GRAPH_URL=http://127.0.0.1:8099``:
+
+    python benchmarks/provider_stub.py --port 8099 --throttle-rate 0.1 --error-rate 0.05
+
+Or let it drive sends through ``WhatsAppService`` in-process, to watch the
+rate limits, retries and failure budget at work:
+
+    python benchmarks/provider_stub.py --drive 500 --concurrency 16 --error-rate 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class StubState:
+    def __init__(self, throttle_rate=0.0, error_rate=0.0, retry_after=1, latency=0.0, seed=None):
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'accepted': 0, 'throttled': 0, 'errors': 0}
+
+    def outcome(self):
+        with self.lock:
+            self.counts['requests'] += 1
+            roll = self.random.random()
+            if roll < self.throttle_rate:
+                self.counts['throttled'] += 1
+                return 429
+            if roll < self.throttle_rate + self.error_rate:
+                self.counts['errors'] += 1
+                return 503
+            self.counts['accepted'] += 1
+            return 200
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            if state.latency:
+                time.sleep(state.latency)
+
+            if not self.path.endswith('/messages'):
+                return self._reply(404, {'error': {'message': 'Unknown path'}})
+
+            status = state.outcome()
+            if status == 429:
+                return self._reply(429, {'error': {'message': 'Rate limit hit', 'code': 130429}},
+                                   {'Retry-After': str(state.retry_after)})
+            if status == 503:
+                return self._reply(503, {'error': {'message': 'Service unavailable'}})
+            return self._reply(200, {'messages': [{'id': f'wamid.stub{state.counts["requests"]}'}]})
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with state.lock:
+                    return self._reply(200, dict(state.counts))
+            return self._reply(404, {'error': {'message': 'Unknown path'}})
+
+        def _reply(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_stub(state, port=0):
+    """Serve the stub on a background thread; returns the server."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name='provider-stub', daemon=True).start()
+    return server
+
+def drive(state, server, count, concurrency):
+    # Settings are read at import time, so configure before importing the app
+    os.environ['META_GRAPH_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ.setdefault('RATE_LIMIT_STORE', 'memory')
+    os.environ.update({
+        'WHATSAPP_PROVIDER': 'meta',
+        'META_WHATSAPP_TOKEN': 'stub-token',
+        'META_PHONE_NUMBER_ID': '100000000000001'
+    })
+    sys.path.insert(0, ROOT)
+    from services.whatsapp_service import WhatsAppService
+
+    service = WhatsAppService()
+    outcomes = {}
+    lock = threading.Lock()
+
+    def send(index):
+        try:
+            service.send_message(f'+1555{index:07d}', 'Stub load test')
+            result = 'sent'
+        except Exception as e:
+            result = type(e).__name__
+        with lock:
+            outcomes[result] = outcomes.get(result, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(count)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'messages': count,
+        'seconds': round(elapsed, 3),
+        'sent_per_second': round(outcomes.get('sent', 0) / elapsed, 2) if elapsed else 0.0,
+        'outcomes': outcomes,
+        'provider_requests': dict(state.counts)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--latency', type=float, default=0.0, help='milliseconds added to every response')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--drive', type=int, default=0, help='send this many messages through WhatsAppService, then exit')
+    parser.add_argument('--concurrency', type=int, default=8)
+    options = parser.parse_args(argv)
+
+    state = StubState(options.throttle_rate, options.error_rate, options.retry_after,
+                      options.latency / 1000, options.seed)
+
+    if options.drive:
+        server = start_stub(state)
+        print(json.dumps(drive(state, server, options.drive, options.concurrency), indent=2))
+        server.shutdown()
+        return 0
+
+    server = ThreadingHTTPServer(('127.0.0.1', options.port), make_handler(state))
+    print(f'Stub Graph API on http://127.0.0.1:{options.port} (GET /stats for counts)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""Report how long a fresh worker process takes to become ready.
+
+Every run is a new Python process against the same throwaway SQLite
+database, timing each startup phase separately: importing the app,
+create_app, schema setup (init_db), the first webhook request and, last,
+importing the Twilio SDK and building its client, as the first Twilio
+request and send would. Each run also forks a child once the app is loaded,
+as gunicorn does with preload_app, and times how long the child takes from
+the fork to serving its first request.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --imports 15 --output startup.json
+
+Workers used to pay for init_db and the Twilio import on every boot. They
+now pay for neither: the schema is set up once before the fork, and the SDK
+is only imported when a Twilio path is first used.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+META_APP_SECRET = 'bench-meta-secret'
+PHASES = ('import_app', 'create_app', 'init_db', 'preloaded_fork', 'first_request', 'twilio_import', 'twilio_client')
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- worker: one cold start in one process --------------------------------
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+def _webhook_request(client):
+    body = json.dumps({'entry': [{'changes': [{'value': {
+        'metadata': {'phone_number_id': 'bench'},
+        'messages': [{'from': '15550000000', 'id': f'wamid.{os.getpid()}', 'text': {'body': 'hello'}}]
+    }}]}]}).encode()
+    signature = 'sha256=' + hmac.new(META_APP_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    client.post('/whatsapp/webhook/meta', data=body, content_type='application/json',
+                headers={'X-Hub-Signature-256': signature})
+
+def time_preloaded_fork(app):
+    """Fork this process, as a preloading gunicorn master forks a worker, and
+    return the milliseconds from the fork until the child has served its
+    first request."""
+    from models import db
+
+    read_end, write_end = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        status = 1
+        try:
+            with app.app_context():
+                # What gunicorn.conf.py's post_fork does
+                db.engine.dispose(close=False)
+            _webhook_request(app.test_client())
+            os.write(write_end, str(_elapsed_ms(started)).encode())
+            status = 0
+        finally:
+            # Skip the parent's atexit handlers and buffered output
+            os._exit(status)
+
+    os.close(write_end)
+    with os.fdopen(read_end) as result:
+        elapsed = result.read()
+    _, status = os.waitpid(pid, 0)
+    if status != 0 or not elapsed:
+        raise RuntimeError('forked worker failed to serve its first request')
+    return float(elapsed)
+
+def run_once():
+    """Time each startup phase in this (fresh) process."""
+    timings = {}
+
+    started = time.perf_counter()
+    from app import create_app
+    timings['import_app'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    app = create_app()
+    timings['create_app'] = _elapsed_ms(started)
+
+    from models.migrations import init_db
+
+    started = time.perf_counter()
+    with app.app_context():
+        init_db()
+    timings['init_db'] = _elapsed_ms(started)
+
+    # Forked before this process serves anything, like a preloading master
+    timings['preloaded_fork'] = time_preloaded_fork(app)
+
+    started = time.perf_counter()
+    _webhook_request(app.test_client())
+    timings['first_request'] = _elapsed_ms(started)
+
+    timings['twilio_loaded_before_use'] = 'twilio' in sys.modules
+
+    # What the old module-level imports cost every worker
+    started = time.perf_counter()
+    import twilio.request_validator
+    import twilio.twiml.messaging_response
+    from twilio.rest import Client
+    timings['twilio_import'] = _elapsed_ms(started)
+
+    # The REST client loads its API modules on first attribute access, at the
+    # first send (with or without this change)
+    started = time.perf_counter()
+    Client('ACbench', 'bench-token').messages
+    timings['twilio_client'] = _elapsed_ms(started)
+
+    return timings
+
+def _worker_env(database_path, tmp_dir):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{database_path}',
+        'DB_AUTO_INIT': '0',
+        'META_APP_SECRET': META_APP_SECRET,
+        'ENCRYPTION_SECRET': env.get('ENCRYPTION_SECRET', 'bench-encryption-secret'),
+        'SESSION_SECRET': 'bench-session-secret',
+        'OUTBOUND_ASYNC': '0',
+        'MESSAGE_LOG_ARCHIVE_DIR': os.path.join(tmp_dir, 'archive')
+    })
+    return env
+
+def slowest_imports(env, cwd, limit):
+    """The top-level packages ``import app`` spends most time in, from
+    -X importtime (each module's own time, summed per package)."""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=cwd, env=dict(env, PYTHONPATH=ROOT), capture_output=True, text=True, check=True
+    ).stderr
+
+    packages = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(own) / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+# --- reporting ------------------------------------------------------------
+
+def summarize(runs):
+    summary = {}
+    for phase in PHASES:
+        values = sorted(run[phase] for run in runs)
+        summary[phase] = {'median_ms': round(statistics.median(values), 3), 'max_ms': values[-1]}
+    median = {phase: summary[phase]['median_ms'] for phase in PHASES}
+    # Sums of measured medians, not measurements: what a worker would spend
+    # before its first Meta request when it boots without preloading
+    summary['estimated_worker_boot_ms'] = {
+        'old': round(median['import_app'] + median['create_app'] + median['init_db']
+                     + median['twilio_import'] + median['first_request'], 3),
+        'no_preload': round(median['import_app'] + median['create_app'] + median['first_request'], 3)
+    }
+    summary['twilio_loaded_before_use'] = any(run['twilio_loaded_before_use'] for run in runs)
+    return summary
+
+def print_report(summary, imports):
+    print(f"{'phase':<16} {'median ms':>10} {'max ms':>10}")
+    print('-' * 38)
+    for phase in PHASES:
+        print(f"{phase:<16} {summary[phase]['median_ms']:>10.1f} {summary[phase]['max_ms']:>10.1f}")
+
+    print(f"\nForked from a preloaded master, first request served after {summary['preloaded_fork']['median_ms']:.1f} ms (measured)")
+
+    boot = summary['estimated_worker_boot_ms']
+    print('\nEstimated worker boot up to the first Meta request (sums of the medians above):')
+    print(f"  import + create_app + init_db + Twilio SDK + request (old):  {boot['old']:>8.1f} ms")
+    print(f"  import + create_app + request (preload_app off):             {boot['no_preload']:>8.1f} ms")
+    print(f"\nTwilio SDK loaded before first Twilio use: {'yes' if summary['twilio_loaded_before_use'] else 'no'}")
+
+    if imports:
+        print('\nSlowest packages under `import app` (ms):')
+        for package, milliseconds in imports:
+            print(f'  {package:<24} {milliseconds:>8.1f}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to measure')
+    parser.add_argument('--imports', type=int, default=10, help='list this many slowest imports (0 to skip)')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.worker:
+        sys.path.insert(0, ROOT)
+        timings = run_once()
+        with open(options.result_file, 'w') as result_file:
+            json.dump(timings, result_file)
+        return 0
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='bot-startup-') as tmp_dir:
+        env = _worker_env(os.path.join(tmp_dir, 'startup.db'), tmp_dir)
+        result_path = os.path.join(tmp_dir, 'timings.json')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--result-file', result_path]
+
+        # The first start creates the schema; it is not counted
+        for index in range(options.runs + 1):
+            subprocess.run(command, cwd=tmp_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+            if index:
+                with open(result_path) as result_file:
+                    runs.append(json.load(result_file))
+
+        imports = slowest_imports(env, tmp_dir, options.imports) if options.imports else []
+
+    summary = summarize(runs)
+    print_report(summary, imports)
+
+    if options.output:
+        report = {
+            'commit': _git_commit(),
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': runs,
+            'summary': summary,
+            'slowest_imports': imports
+        }
+        with open(options.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f'\nWrote {options.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""Load test the webhook and API endpoints against a throwaway database.
+
+Every scale (rule count x log table size) runs in its own subprocess with a
+fresh SQLite database built by ``init_db``, so caches and connection
+pools never leak between scales. Outbound sends are stubbed, so the numbers
+measure this app only.
+
+    python benchmarks/webhooks.py --rules 10,1000 --logs 0,100000 --concurrency 1,8
+    python benchmarks/webhooks.py --output after.json --compare before.json
+
+Results are written as JSON keyed by endpoint, scale and concurrency, so two
+runs (e.g. before and after a commit) can be compared with ``--compare``.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = ('twilio', 'meta', 'api')
+TWILIO_AUTH_TOKEN = 'bench-twilio-token'
+META_APP_SECRET = 'bench-meta-secret'
+TWILIO_URL = 'http://localhost/whatsapp/webhook/twilio'
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(percent / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- worker: one scale in one process ------------------------------------
+
+def _phone(index):
+    return f'1555{index:07d}'
+
+def _seed(users, rules, logs, seed):
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert
+    from models import db
+    from models.bot import Bot
+    from models.rule import Rule
+    from models.user import User
+    from services.log_writer import write_logs
+
+    rng = random.Random(seed)
+    password_hash = generate_password_hash('bench')
+    db.session.execute(insert(User), [
+        {'username': f'bench{index}', 'password_hash': password_hash, 'phone_number': _phone(index)}
+        for index in range(users)
+    ])
+    user_ids = [user.id for user in User.query.order_by(User.id)]
+    db.session.execute(insert(Bot), [
+        {'user_id': user_id, 'name': f'Bench bot {user_id}', 'fallback_message': 'Sorry, I did not understand.', 'active': True}
+        for user_id in user_ids
+    ])
+    bot_ids = [bot.id for bot in Bot.query.order_by(Bot.id)]
+
+    keywords = [f'kw{index:05d}' for index in range(rules)]
+    for bot_id in bot_ids:
+        db.session.execute(insert(Rule), [
+            {'bot_id': bot_id, 'keyword': keyword, 'response': f'Response for {keyword}'}
+            for keyword in keywords
+        ])
+    db.session.commit()
+
+    # Spread the existing history over the last 30 days, in chunks so
+    # large tables do not need to be built in memory at once.
+    now = datetime.utcnow()
+    remaining = logs
+    while remaining > 0:
+        chunk = min(remaining, 5000)
+        rows = []
+        for _ in range(chunk):
+            sender_index = rng.randrange(users * 20)
+            rows.append({
+                'bot_id': rng.choice(bot_ids),
+                'sender': _phone(sender_index),
+                'direction': rng.choice(('incoming', 'outgoing')),
+                'message': 'historic message',
+                'timestamp': now - timedelta(seconds=rng.randrange(30 * 24 * 3600))
+            })
+        write_logs(rows)
+        db.session.commit()
+        remaining -= chunk
+
+    return bot_ids, keywords
+
+def _message_mix(keywords, rng):
+    """Mostly keyword hits, some misses and some menu requests."""
+    roll = rng.random()
+    if keywords and roll < 0.7:
+        return f'please tell me about {rng.choice(keywords)} today'
+    if roll < 0.9:
+        return 'something no rule will match'
+    return 'help'
+
+def _twilio_request(message, sender, rng):
+    from twilio.request_validator import RequestValidator
+
+    params = {
+        'Body': message,
+        'From': f'whatsapp:+{sender}',
+        'To': 'whatsapp:+14155238886',
+        'MessageSid': f'SM{rng.getrandbits(64):016x}'
+    }
+    signature = RequestValidator(TWILIO_AUTH_TOKEN).compute_signature(TWILIO_URL, params)
+    return '/whatsapp/webhook/twilio', {'data': params, 'headers': {'X-Twilio-Signature': signature}}
+
+def _meta_request(message, sender, rng):
+    payload = {
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'value': {'messages': [{
+            'from': sender,
+            'id': f'wamid.{rng.getrandbits(64):016x}',
+            'text': {'body': message}
+        }]}}]}]
+    }
+    body = json.dumps(payload).encode('utf-8')
+    signature = 'sha256=' + hmac.new(META_APP_SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return '/whatsapp/webhook/meta', {
+        'data': body,
+        'headers': {'X-Hub-Signature-256': signature, 'Content-Type': 'application/json'}
+    }
+
+def _api_request(message, sender, bot_id):
+    return '/api/get_response', {'json': {'sender': sender, 'message': message, 'bot_id': bot_id}}
+
+def _build_requests(target, count, users, bot_ids, keywords, rng):
+    requests_ = []
+    for _ in range(count):
+        index = rng.randrange(users)
+        message = _message_mix(keywords, rng)
+        if target == 'twilio':
+            requests_.append(_twilio_request(message, _phone(index), rng))
+        elif target == 'meta':
+            requests_.append(_meta_request(message, _phone(index), rng))
+        else:
+            requests_.append(_api_request(message, _phone(index), bot_ids[index]))
+    return requests_
+
+def _drive(app, requests_, concurrency):
+    """Fire the prepared requests from ``concurrency`` threads."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    cursor = iter(requests_)
+
+    def work():
+        client = app.test_client()
+        local = []
+        failed = 0
+        while True:
+            with lock:
+                item = next(cursor, None)
+            if item is None:
+                break
+            path, kwargs = item
+            started = time.perf_counter()
+            response = client.post(path, **kwargs)
+            local.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, errors[0], elapsed
+
+def run_scale(options):
+    """Benchmark every target/concurrency pair at one scale; returns result rows."""
+    from services.dispatcher import dispatcher
+    from services.whatsapp_service import WhatsAppService
+
+    def fake_send(self, to_number, message):
+        if options.send_latency:
+            time.sleep(options.send_latency / 1000)
+        return 'bench-message-id'
+
+    WhatsAppService.send_message = fake_send
+
+    from app import create_app
+    from models import db
+    from models.migrations import init_db
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        bot_ids, keywords = _seed(options.users, options.scale_rules, options.scale_logs, options.seed)
+
+    rng = random.Random(options.seed)
+    results = []
+    for target in options.targets:
+        for concurrency in options.concurrency:
+            warmup = _build_requests(target, options.warmup, options.users, bot_ids, keywords, rng)
+            _drive(app, warmup, concurrency)
+
+            requests_ = _build_requests(target, options.requests, options.users, bot_ids, keywords, rng)
+            latencies, errors, elapsed = _drive(app, requests_, concurrency)
+            latencies.sort()
+            results.append({
+                'target': target,
+                'rules': options.scale_rules,
+                'logs': options.scale_logs,
+                'concurrency': concurrency,
+                'requests': len(latencies),
+                'errors': errors,
+                'seconds': round(elapsed, 4),
+                'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+                'p90_ms': round(_percentile(latencies, 90) * 1000, 3),
+                'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+                'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0
+            })
+
+    dispatcher.shutdown()
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+def _worker_env(database_path, tmp_dir):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{database_path}',
+        'TWILIO_AUTH_TOKEN': TWILIO_AUTH_TOKEN,
+        'META_APP_SECRET': META_APP_SECRET,
+        'ENCRYPTION_SECRET': env.get('ENCRYPTION_SECRET', 'bench-encryption-secret'),
+        'SESSION_SECRET': 'bench-session-secret',
+        'MESSAGE_LOG_ARCHIVE_DIR': os.path.join(tmp_dir, 'archive')
+    })
+    return env
+
+# --- reporting ------------------------------------------------------------
+
+def _key(row):
+    return (row['target'], row['rules'], row['logs'], row['concurrency'])
+
+def print_table(rows):
+    header = f"{'target':<7} {'rules':>6} {'logs':>8} {'conc':>4} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'errors':>6}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['target']:<7} {row['rules']:>6} {row['logs']:>8} {row['concurrency']:>4} "
+              f"{row['throughput']:>9.1f} {row['p50_ms']:>8.2f} {row['p90_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>6}")
+
+def compare(baseline, current, threshold):
+    """Print per-row changes against a baseline run; returns the regressed rows."""
+    previous = {_key(row): row for row in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} (threshold {threshold:.0%}):")
+    for row in current['results']:
+        old = previous.get(_key(row))
+        if not old or not old['throughput'] or not old['p99_ms']:
+            continue
+        throughput_change = row['throughput'] / old['throughput'] - 1
+        p99_change = row['p99_ms'] / old['p99_ms'] - 1
+        regressed = throughput_change < -threshold or p99_change > threshold
+        if regressed:
+            regressions.append(row)
+        print(f"{row['target']:<7} rules={row['rules']:<6} logs={row['logs']:<8} conc={row['concurrency']:<3} "
+              f"req/s {throughput_change:+.1%}  p99 {p99_change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma separated: twilio,meta,api')
+    parser.add_argument('--rules', type=_int_list, default=[10, 1000], help='rules per bot, comma separated')
+    parser.add_argument('--logs', type=_int_list, default=[0, 100000], help='existing message_logs rows, comma separated')
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 8], help='client threads, comma separated')
+    parser.add_argument('--users', type=int, default=50, help='registered users, each with one active bot')
+    parser.add_argument('--requests', type=int, default=500, help='measured requests per run')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per run')
+    parser.add_argument('--send-latency', type=float, default=0.0, help='milliseconds each stubbed send sleeps')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change counted as a regression')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scale-rules', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--scale-logs', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    options.targets = [target for target in options.targets.split(',') if target]
+
+    unknown = set(options.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    if options.worker:
+        sys.path.insert(0, ROOT)
+        results = run_scale(options)
+        with open(options.result_file, 'w') as result_file:
+            json.dump(results, result_file)
+        return 0
+
+    results = []
+    for rules in options.rules:
+        for logs in options.logs:
+            print(f'Running rules={rules} logs={logs} ...', file=sys.stderr)
+            with tempfile.TemporaryDirectory(prefix='bot-bench-') as tmp_dir:
+                database_path = os.path.join(tmp_dir, 'bench.db')
+                result_path = os.path.join(tmp_dir, 'results.json')
+                command = [sys.executable, os.path.abspath(__file__), '--worker',
+                           '--scale-rules', str(rules), '--scale-logs', str(logs),
+                           '--result-file', result_path]
+                command += argv if argv is not None else sys.argv[1:]
+                subprocess.run(command, cwd=tmp_dir, env=_worker_env(database_path, tmp_dir), check=True)
+                with open(result_path) as result_file:
+                    results.extend(json.load(result_file))
+
+    report = {
+        'commit': _git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {
+            'users': options.users,
+            'requests': options.requests,
+            'warmup': options.warmup,
+            'send_latency_ms': options.send_latency,
+            'seed': options.seed
+        },
+        'results': results
+    }
+
+    print_table(results)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f'\nWrote {options.output}')
+
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(baseline, report, options.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from models.migrations import check_query_plans, init_db, pending_migrations
+from services.archiver import archive_expired_logs, iter_archived_logs
+from services.broadcast import BroadcastDeferred, requeue_broadcast, run_broadcast
+from services.dedup import purge_processed_messages
+from services.rollups import rebuild_rollups
+
+db_cli = AppGroup('db', help='Database schema management.')
+
+@db_cli.command('upgrade')
+def upgrade_db():
+    """Create missing tables and apply pending schema migrations."""
+    applied = init_db()
+    for version, description in applied:
+        click.echo(f'Applied {version}: {description}')
+    if not applied:
+        click.echo('Database is up to date.')
+
+@db_cli.command('status')
+def db_status():
+    """List migrations that have not been applied yet."""
+    pending = pending_migrations()
+    for version, description, _ in pending:
+        click.echo(f'Pending {version}: {description}')
+    if not pending:
+        click.echo('Database is up to date.')
+
+@db_cli.command('check-plans')
+def check_plans():
+    """Show query plans for hot lookups and fail if any needs a table scan."""
+    failed = False
+    for name, plan, uses_index in check_query_plans():
+        click.echo(f'{"ok  " if uses_index else "SCAN"} {name}')
+        for line in plan:
+            click.echo(f'       {line}')
+        failed = failed or not uses_index
+    if failed:
+        raise SystemExit(1)
+
+rollups_cli = AppGroup('rollups', help='Maintain the analytics rollup tables.')
+
+@rollups_cli.command('backfill')
+@click.option('--bot-id', type=int, default=None, help='Only rebuild this bot.')
+def backfill_rollups(bot_id):
+    """Rebuild per-day message rollups and sender stats from existing message logs."""
+    days = rebuild_rollups(bot_id)
+    click.echo(f'Rebuilt {days} bot-day rollups.')
+
+logs_cli = AppGroup('logs', help='Message log retention and archives.')
+
+@logs_cli.command('archive')
+@click.option('--bot-id', type=int, default=None, help='Only archive this bot.')
+@click.option('--days', type=int, default=None, help='Retention for bots without their own setting.')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@click.option('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+def archive_logs(bot_id, days, batch_size, pause):
+    """Move message logs past their retention period into compressed archives."""
+    if days is None:
+        days = current_app.config['MESSAGE_LOG_RETENTION_DAYS']
+    results = archive_expired_logs(current_app.config['MESSAGE_LOG_ARCHIVE_DIR'], days, bot_id, batch_size, pause)
+    for archived_bot_id, archived in results.items():
+        click.echo(f'Bot {archived_bot_id}: archived {archived} messages.')
+    if not results:
+        click.echo('No retention policy applies; nothing archived.')
+
+@logs_cli.command('dump')
+@click.option('--bot-id', type=int, required=True)
+@click.option('--from', 'start_day', type=click.DateTime(['%Y-%m-%d']), default=None)
+@click.option('--to', 'end_day', type=click.DateTime(['%Y-%m-%d']), default=None)
+def dump_archive(bot_id, start_day, end_day):
+    """Stream a bot's archived messages to stdout as JSON lines."""
+    records = iter_archived_logs(
+        current_app.config['MESSAGE_LOG_ARCHIVE_DIR'],
+        bot_id,
+        start_day.date() if start_day else None,
+        end_day.date() if end_day else None
+    )
+    for record in records:
+        click.echo(json.dumps(record, ensure_ascii=False))
+
+broadcasts_cli = AppGroup('broadcasts', help='Run broadcast jobs.')
+
+@broadcasts_cli.command('run')
+@click.argument('broadcast_id', type=int)
+@click.option('--requeue', is_flag=True, help='Take over a broadcast left running by a process that died.')
+def run_broadcast_command(broadcast_id, requeue):
+    """Send a pending broadcast in the foreground."""
+    if requeue:
+        requeue_broadcast(broadcast_id)
+    config = current_app.config
+    try:
+        completed = run_broadcast(broadcast_id, config['BROADCAST_WORKERS'], config['BROADCAST_BATCH_SIZE'])
+    except BroadcastDeferred as e:
+        click.echo(f'Broadcast {broadcast_id} paused while the provider is degraded ({e}). Run it again later.')
+        return
+    if completed:
+        click.echo(f'Broadcast {broadcast_id} completed.')
+    else:
+        click.echo(f'Broadcast {broadcast_id} is not pending or was cancelled.')
+
+@logs_cli.command('purge-dedup')
+@click.option('--hours', type=int, default=None, help='Keep keys this many hours (default DEDUP_RETENTION_HOURS).')
+def purge_dedup(hours):
+    """Delete webhook message ids older than the redelivery window."""
+    if hours is None:
+        hours = current_app.config['DEDUP_RETENTION_HOURS']
+    purged = purge_processed_messages(datetime.utcnow() - timedelta(hours=hours))
+    click.echo(f'Purged {purged} processed message ids.')
@@ -0,0 +1,48 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master and forked into the workers
+(preload_app), so each worker starts without re-importing the code. The
+master creates and migrates the schema before forking, then drops its
+database connections so no worker inherits a shared socket.
+
+Set GUNICORN_RELOAD=1 for development: code reloading needs every worker
+to import the app itself, so preloading is turned off and each worker
+initialises the schema on start instead.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+reuse_port = True
+
+reload = os.environ.get('GUNICORN_RELOAD') == '1'
+preload_app = not reload
+if reload:
+    os.environ.setdefault('DB_AUTO_INIT', '1')
+
+def on_starting(server):
+    if not preload_app:
+        return
+
+    from models import db
+    from models.migrations import init_db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for version, description in init_db():
+            server.log.info('Applied migration %s: %s', version, description)
+        # Forked workers must not share the master's pooled connections
+        db.engine.dispose()
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    from models import db
+
+    with worker.app.wsgi().app_context():
+        # Anything the master still holds stays open for the master;
+        # close=False only forgets it in this worker.
+        db.engine.dispose(close=False)
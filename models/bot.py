@@ -2,15 +2,30 @@ from models import db
 
 class Bot(db.Model):
     __tablename__ = 'bots'
+    __table_args__ = (
+        db.Index('ix_bots_user_active', 'user_id', 'active'),
+        db.Index('ix_bots_user_id_id', 'user_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     fallback_message = db.Column(db.Text, nullable=False, default='Sorry, I did not understand that.')
     active = db.Column(db.Boolean, default=True)
+    # Bumped whenever the bot or its rules change; cached matchers and menus
+    # are keyed on it so stale copies in other workers get rebuilt.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Days of message history to keep; None falls back to MESSAGE_LOG_RETENTION_DAYS.
+    retention_days = db.Column(db.Integer, nullable=True)
     
     rules = db.relationship('Rule', backref='bot', lazy=True, cascade='all, delete-orphan')
     message_logs = db.relationship('MessageLog', backref='bot', lazy=True, cascade='all, delete-orphan')
+    rollups = db.relationship('MessageRollup', lazy=True, cascade='all, delete-orphan')
+    rollup_senders = db.relationship('RollupSender', lazy=True, cascade='all, delete-orphan')
+    senders = db.relationship('BotSender', lazy=True, cascade='all, delete-orphan')
+    
+    def bump_version(self):
+        self.version = (self.version or 0) + 1
     
     def __repr__(self):
         return f'<Bot {self.name}>'
@@ -0,0 +1,16 @@
+from models import db
+
+class BotSender(db.Model):
+    __tablename__ = 'bot_senders'
+    __table_args__ = (
+        db.Index('ix_bot_senders_bot_last_seen', 'bot_id', 'last_seen', 'sender'),
+    )
+    
+    bot_id = db.Column(db.Integer, db.ForeignKey('bots.id'), primary_key=True)
+    sender = db.Column(db.String(100), primary_key=True)
+    first_seen = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<BotSender {self.bot_id} {self.sender}>'
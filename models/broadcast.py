@@ -0,0 +1,55 @@
+from datetime import datetime
+from models import db
+
+class Broadcast(db.Model):
+    __tablename__ = 'broadcasts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    message = db.Column(db.Text, nullable=False)
+    provider = db.Column(db.String(20), nullable=False)
+    # pending -> running -> completed, or cancelled; an interrupted run goes
+    # back to pending so it can be resumed.
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    sent = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    recipients = db.relationship('BroadcastRecipient', backref='broadcast', lazy=True, cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'provider': self.provider,
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'pending': self.total - self.sent - self.failed,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Broadcast {self.id} {self.status}>'
+
+class BroadcastRecipient(db.Model):
+    __tablename__ = 'broadcast_recipients'
+    __table_args__ = (
+        db.Index('ix_broadcast_recipients_broadcast_status', 'broadcast_id', 'status', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcasts.id'), nullable=False)
+    phone_number = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    message_id = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<BroadcastRecipient {self.broadcast_id} {self.phone_number}>'
@@ -0,0 +1,52 @@
+import os
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URL = 'sqlite:///whatsapp_bot.db'
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Heroku/Replit style URLs use the scheme SQLAlchemy dropped in 1.4.
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url):
+    """Pool and driver settings for the configured backend, from the environment."""
+    options = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+
+    if url.startswith('sqlite'):
+        options['connect_args'] = {
+            'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30)),
+            'check_same_thread': False
+        }
+    else:
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        options['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+    return options
+
+def install_sqlite_pragmas(engine):
+    """Tune every new SQLite connection for concurrent webhook writes.
+
+    WAL lets readers run alongside the single writer, synchronous=NORMAL is
+    durable in WAL mode without an fsync per commit, and busy_timeout makes
+    writers wait for the lock instead of failing with "database is locked".
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    busy_timeout_ms = int(float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30)) * 1000)
+    cache_size_kb = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+        cursor.execute(f'PRAGMA cache_size=-{cache_size_kb}')
+        cursor.close()
@@ -3,6 +3,11 @@ from models import db
 
 class MessageLog(db.Model):
     __tablename__ = 'message_logs'
+    __table_args__ = (
+        db.Index('ix_message_logs_bot_sender_timestamp', 'bot_id', 'sender', 'timestamp'),
+        db.Index('ix_message_logs_bot_direction', 'bot_id', 'direction'),
+        db.Index('ix_message_logs_bot_timestamp', 'bot_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     bot_id = db.Column(db.Integer, db.ForeignKey('bots.id'), nullable=False)
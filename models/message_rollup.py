@@ -0,0 +1,23 @@
+from models import db
+
+class MessageRollup(db.Model):
+    __tablename__ = 'message_rollups'
+    
+    bot_id = db.Column(db.Integer, db.ForeignKey('bots.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    incoming = db.Column(db.Integer, nullable=False, default=0)
+    outgoing = db.Column(db.Integer, nullable=False, default=0)
+    unique_senders = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<MessageRollup {self.bot_id} {self.day}>'
+
+class RollupSender(db.Model):
+    __tablename__ = 'message_rollup_senders'
+    
+    bot_id = db.Column(db.Integer, db.ForeignKey('bots.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    sender = db.Column(db.String(100), primary_key=True)
+    
+    def __repr__(self):
+        return f'<RollupSender {self.bot_id} {self.day} {self.sender}>'
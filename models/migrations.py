@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models import db
+
+# Versioned schema changes for databases that already exist. db.create_all()
+# only creates missing tables, so anything that alters an existing table
+# (columns, indexes) is added here as the next numbered migration. Each step
+# must be safe to run on a database freshly built by create_all().
+
+def _create_index(conn, name, table, columns):
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+def _hot_path_indexes(conn):
+    _create_index(conn, 'ix_message_logs_bot_sender', 'message_logs', ['bot_id', 'sender'])
+    _create_index(conn, 'ix_message_logs_bot_direction', 'message_logs', ['bot_id', 'direction'])
+    _create_index(conn, 'ix_rules_bot_id', 'rules', ['bot_id'])
+    _create_index(conn, 'ix_bots_user_active', 'bots', ['user_id', 'active'])
+    _create_index(conn, 'ix_users_phone_number', 'users', ['phone_number'])
+
+def _drop_index(conn, name):
+    conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+def _add_column(conn, table, column, ddl):
+    columns = {info['name'] for info in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+def _bot_version(conn):
+    _add_column(conn, 'bots', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+def _log_retention(conn):
+    _add_column(conn, 'bots', 'retention_days', 'INTEGER')
+    _create_index(conn, 'ix_message_logs_bot_timestamp', 'message_logs', ['bot_id', 'timestamp'])
+
+def _twilio_number_routing(conn):
+    from models.user import normalize_phone_number
+
+    _add_column(conn, 'users', 'twilio_number_normalized', 'VARCHAR(20)')
+    _create_index(conn, 'ix_users_twilio_number_normalized', 'users', ['twilio_number_normalized'])
+    rows = conn.execute(text('SELECT id, twilio_whatsapp_number FROM users WHERE twilio_whatsapp_number IS NOT NULL')).all()
+    for user_id, number in rows:
+        conn.execute(
+            text('UPDATE users SET twilio_number_normalized = :number WHERE id = :id'),
+            {'number': normalize_phone_number(number), 'id': user_id}
+        )
+
+def _keyset_indexes(conn):
+    # Each replaced index is a prefix of its successor, so lookups that used
+    # it are still served.
+    _create_index(conn, 'ix_message_logs_bot_sender_timestamp', 'message_logs', ['bot_id', 'sender', 'timestamp'])
+    _drop_index(conn, 'ix_message_logs_bot_sender')
+    _create_index(conn, 'ix_rules_bot_id_id', 'rules', ['bot_id', 'id'])
+    _drop_index(conn, 'ix_rules_bot_id')
+    _create_index(conn, 'ix_bots_user_id_id', 'bots', ['user_id', 'id'])
+    _create_index(conn, 'ix_bot_senders_bot_last_seen', 'bot_senders', ['bot_id', 'last_seen', 'sender'])
+
+def _unique_twilio_numbers(conn):
+    rows = conn.execute(text(
+        'SELECT id, twilio_number_normalized FROM users WHERE twilio_number_normalized IS NOT NULL ORDER BY id'
+    )).all()
+    owners = {}
+    for user_id, number in rows:
+        if number not in owners:
+            owners[number] = user_id
+            continue
+        # Messages to a shared number went to the oldest account; the others
+        # keep their settings but must claim another number.
+        print(f'WARNING: user {user_id} shares Twilio number {number} with user {owners[number]}; '
+              'not routing it to them')
+        conn.execute(text('UPDATE users SET twilio_number_normalized = NULL WHERE id = :id'), {'id': user_id})
+    _drop_index(conn, 'ix_users_twilio_number_normalized')
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_users_twilio_number_normalized '
+        'ON users (twilio_number_normalized) WHERE twilio_number_normalized IS NOT NULL'
+    ))
+
+MIGRATIONS = [
+    (1, 'Indexes for webhook, routing and analytics lookups', _hot_path_indexes),
+    (2, 'Add bots.version for cached matcher and menu invalidation', _bot_version),
+    (3, 'Add bots.retention_days and a message_logs (bot_id, timestamp) index', _log_retention),
+    (4, 'Add users.twilio_number_normalized for routing Twilio messages by destination', _twilio_number_routing),
+    (5, 'Indexes for keyset pagination of bots, rules, senders and conversations', _keyset_indexes),
+    (6, 'Make users.twilio_number_normalized unique so each number routes to one account', _unique_twilio_numbers),
+]
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'description VARCHAR(200) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+def pending_migrations():
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every process
+SCHEMA_LOCK_KEY = 727461677
+
+@contextmanager
+def _schema_lock():
+    """A transaction holding a database-wide lock, so workers starting
+    together create tables and apply migrations one at a time."""
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': SCHEMA_LOCK_KEY})
+        elif conn.dialect.name == 'sqlite':
+            # Takes the write lock up front; others wait for busy_timeout
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def run_migrations():
+    """Apply every pending migration, each in its own transaction.
+
+    Pending versions are re-read after taking the lock, so a migration that
+    another process applied while this one waited is skipped.
+    """
+    applied = []
+    while True:
+        with _schema_lock() as conn:
+            _ensure_version_table(conn)
+            done = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+            pending = [migration for migration in MIGRATIONS if migration[0] not in done]
+            if not pending:
+                return applied
+
+            version, description, upgrade = pending[0]
+            upgrade(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        applied.append((version, description))
+
+def init_db():
+    """Create missing tables, then apply pending migrations.
+
+    Runs once per deployment (``flask db upgrade``, or gunicorn's master
+    before forking) rather than in every worker's create_app.
+    """
+    with _schema_lock() as conn:
+        db.metadata.create_all(conn)
+    return run_migrations()
+
+# Lookups that run on every webhook or analytics request. check_query_plans()
+# asks the database how it would execute each one, so a missing index shows
+# up as a full table scan.
+HOT_QUERIES = [
+    ('first-message count', 'SELECT count(*) FROM message_logs WHERE bot_id = :bot_id AND sender = :sender',
+     {'bot_id': 1, 'sender': 'whatsapp:+10000000000'}),
+    ('analytics direction count', 'SELECT count(*) FROM message_logs WHERE bot_id = :bot_id AND direction = :direction',
+     {'bot_id': 1, 'direction': 'incoming'}),
+    ('rules by bot', 'SELECT id, keyword, response FROM rules WHERE bot_id = :bot_id',
+     {'bot_id': 1}),
+    ('active bot by user', 'SELECT id FROM bots WHERE user_id = :user_id AND active = :active',
+     {'user_id': 1, 'active': True}),
+    ('user by phone number', 'SELECT id FROM users WHERE phone_number = :phone_number',
+     {'phone_number': '10000000000'}),
+    ('conversation page', 'SELECT id, direction, message, timestamp FROM message_logs '
+     'WHERE bot_id = :bot_id AND sender = :sender AND (timestamp, id) < (:timestamp, :id) '
+     'ORDER BY timestamp DESC, id DESC LIMIT 50',
+     {'bot_id': 1, 'sender': 'whatsapp:+10000000000', 'timestamp': '2030-01-01 00:00:00', 'id': 0}),
+    ('senders page', 'SELECT sender, last_seen, message_count FROM bot_senders '
+     'WHERE bot_id = :bot_id ORDER BY last_seen DESC, sender DESC LIMIT 50',
+     {'bot_id': 1}),
+    ('rules page', 'SELECT id, keyword, response FROM rules WHERE bot_id = :bot_id AND id > :id ORDER BY id LIMIT 100',
+     {'bot_id': 1, 'id': 0}),
+    ('user by Twilio number', 'SELECT id FROM users WHERE twilio_number_normalized = :number',
+     {'number': '14155238886'}),
+]
+
+def _explain(conn, sql, params):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)
+        plan = [row[-1] for row in rows]
+        uses_index = all(not line.startswith('SCAN') for line in plan)
+    else:
+        # Small tables are sequentially scanned even when an index exists;
+        # disable that so the plan shows whether an index is usable at all.
+        conn.execute(text('SET LOCAL enable_seqscan = off'))
+        rows = conn.execute(text(f'EXPLAIN {sql}'), params)
+        plan = [row[0] for row in rows]
+        uses_index = not any('Seq Scan' in line for line in plan)
+    return plan, uses_index
+
+def check_query_plans():
+    """Return (name, plan lines, uses_index) for each hot query."""
+    results = []
+    with db.engine.connect() as conn:
+        for name, sql, params in HOT_QUERIES:
+            plan, uses_index = _explain(conn, sql, params)
+            results.append((name, plan, uses_index))
+    return results
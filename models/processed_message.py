@@ -0,0 +1,14 @@
+from datetime import datetime
+from models import db
+
+class ProcessedMessage(db.Model):
+    __tablename__ = 'processed_messages'
+    
+    # The composite key is what makes a redelivered webhook a no-op across
+    # workers and restarts.
+    provider = db.Column(db.String(20), primary_key=True)
+    message_id = db.Column(db.String(128), primary_key=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<ProcessedMessage {self.provider} {self.message_id}>'
@@ -0,0 +1,12 @@
+from models import db
+
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_buckets'
+    
+    key = db.Column(db.String(200), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    # Unix time of the last refill, shared by every worker and host
+    updated_at = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<RateLimitBucket {self.key} {self.tokens}>'
@@ -2,6 +2,9 @@ from models import db
 
 class Rule(db.Model):
     __tablename__ = 'rules'
+    __table_args__ = (
+        db.Index('ix_rules_bot_id_id', 'bot_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     bot_id = db.Column(db.Integer, db.ForeignKey('bots.id'), nullable=False)
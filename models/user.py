@@ -2,14 +2,34 @@ from datetime import datetime
 from models import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from utils.encryption import encrypt_value, decrypt_value
+from utils.cache import TTLCache
+
+# Decrypted credentials per (user id, provider). Entries remember the
+# ciphertext they were decrypted from, so a row changed by another worker is
+# never served stale; set_*_credentials also drop them eagerly.
+_credentials_cache = TTLCache(maxsize=1024, ttl=300)
+
+def normalize_phone_number(value):
+    """Digits only, so 'whatsapp:+1 (415) 523-8886' and '14155238886' match."""
+    return ''.join(ch for ch in (value or '') if ch.isdigit()) or None
+
+def invalidate_credentials(user_id):
+    _credentials_cache.pop((user_id, 'meta'))
+    _credentials_cache.pop((user_id, 'twilio'))
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Each Twilio number routes to exactly one account
+        db.Index('ux_users_twilio_number_normalized', 'twilio_number_normalized', unique=True,
+                 sqlite_where=db.text('twilio_number_normalized IS NOT NULL'),
+                 postgresql_where=db.text('twilio_number_normalized IS NOT NULL')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
-    phone_number = db.Column(db.String(20), nullable=True)
+    phone_number = db.Column(db.String(20), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     whatsapp_provider = db.Column(db.String(20), default='meta')
@@ -21,8 +41,11 @@ class User(db.Model):
     twilio_account_sid_encrypted = db.Column(db.Text, nullable=True)
     twilio_auth_token_encrypted = db.Column(db.Text, nullable=True)
     twilio_whatsapp_number = db.Column(db.String(30), nullable=True)
+    # Digits of twilio_whatsapp_number; inbound Twilio messages are routed by it
+    twilio_number_normalized = db.Column(db.String(20), nullable=True)
 
     bots = db.relationship('Bot', backref='user', lazy=True, cascade='all, delete-orphan')
+    broadcasts = db.relationship('Broadcast', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -34,26 +57,47 @@ class User(db.Model):
         self.meta_access_token_encrypted = encrypt_value(access_token) if access_token else None
         self.meta_phone_number_id_encrypted = encrypt_value(phone_number_id) if phone_number_id else None
         self.meta_api_version = api_version if api_version else 'v21.0'
+        invalidate_credentials(self.id)
     
     def get_meta_credentials(self):
+        encrypted = (self.meta_access_token_encrypted, self.meta_phone_number_id_encrypted)
+        access_token, phone_number_id = self._decrypt_cached('meta', encrypted)
         return {
-            'access_token': decrypt_value(self.meta_access_token_encrypted),
-            'phone_number_id': decrypt_value(self.meta_phone_number_id_encrypted),
+            'access_token': access_token,
+            'phone_number_id': phone_number_id,
             'api_version': self.meta_api_version or 'v21.0'
         }
     
     def set_twilio_credentials(self, account_sid, auth_token, whatsapp_number):
         self.twilio_account_sid_encrypted = encrypt_value(account_sid) if account_sid else None
         self.twilio_auth_token_encrypted = encrypt_value(auth_token) if auth_token else None
+        self.set_twilio_number(whatsapp_number)
+        invalidate_credentials(self.id)
+    
+    def set_twilio_number(self, whatsapp_number):
         self.twilio_whatsapp_number = whatsapp_number
+        self.twilio_number_normalized = normalize_phone_number(whatsapp_number)
     
     def get_twilio_credentials(self):
+        encrypted = (self.twilio_account_sid_encrypted, self.twilio_auth_token_encrypted)
+        account_sid, auth_token = self._decrypt_cached('twilio', encrypted)
         return {
-            'account_sid': decrypt_value(self.twilio_account_sid_encrypted),
-            'auth_token': decrypt_value(self.twilio_auth_token_encrypted),
+            'account_sid': account_sid,
+            'auth_token': auth_token,
             'whatsapp_number': self.twilio_whatsapp_number
         }
     
+    def _decrypt_cached(self, provider, encrypted):
+        key = (self.id, provider)
+        cached = _credentials_cache.get(key) if self.id else None
+        if cached and cached[0] == encrypted:
+            return cached[1]
+        
+        decrypted = tuple(decrypt_value(value) for value in encrypted)
+        if self.id:
+            _credentials_cache.set(key, (encrypted, decrypted))
+        return decrypted
+    
     def has_meta_credentials(self):
         creds = self.get_meta_credentials()
         return bool(creds['access_token'] and creds['phone_number_id'])
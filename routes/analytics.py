@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from models import db
 from models.bot import Bot
-from models.message_log import MessageLog
+from models.message_rollup import MessageRollup
+from models.bot_sender import BotSender
 from sqlalchemy import func
+from services.timeseries import BUCKET_SIZES, bot_timeseries
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -18,24 +21,89 @@ def login_required(f):
 @analytics_bp.route('/analytics')
 @login_required
 def analytics():
-    user_bots = Bot.query.filter_by(user_id=session['user_id']).all()
+    user_id = session['user_id']
+    
+    totals = db.session.query(
+        MessageRollup.bot_id,
+        func.sum(MessageRollup.incoming).label('incoming'),
+        func.sum(MessageRollup.outgoing).label('outgoing')
+    ).join(Bot).filter(Bot.user_id == user_id).group_by(MessageRollup.bot_id).subquery()
+    
+    senders = db.session.query(
+        BotSender.bot_id,
+        func.count().label('unique_senders')
+    ).join(Bot).filter(Bot.user_id == user_id).group_by(BotSender.bot_id).subquery()
+    
+    rows = db.session.query(
+        Bot,
+        func.coalesce(totals.c.incoming, 0),
+        func.coalesce(totals.c.outgoing, 0),
+        func.coalesce(senders.c.unique_senders, 0)
+    ).outerjoin(totals, totals.c.bot_id == Bot.id) \
+     .outerjoin(senders, senders.c.bot_id == Bot.id) \
+     .filter(Bot.user_id == user_id) \
+     .order_by(Bot.id).all()
     
     bot_stats = []
-    for bot in user_bots:
-        total_messages = MessageLog.query.filter_by(bot_id=bot.id).count()
-        incoming = MessageLog.query.filter_by(bot_id=bot.id, direction='incoming').count()
-        outgoing = MessageLog.query.filter_by(bot_id=bot.id, direction='outgoing').count()
-        
-        unique_senders = db.session.query(
-            func.count(func.distinct(MessageLog.sender))
-        ).filter_by(bot_id=bot.id).scalar()
-        
+    for bot, incoming, outgoing, unique_senders in rows:
         bot_stats.append({
             'bot': bot,
-            'total_messages': total_messages,
+            'total_messages': incoming + outgoing,
             'incoming': incoming,
             'outgoing': outgoing,
             'unique_senders': unique_senders
         })
     
     return render_template('analytics.html', bot_stats=bot_stats)
+
+DEFAULT_WINDOWS = {
+    'hour': timedelta(hours=24),
+    'day': timedelta(days=30)
+}
+MAX_BUCKETS = 1000
+
+def _parse_time(value):
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    # Logs are stored as naive UTC; convert offsets like Z or +02:00 to match
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@analytics_bp.route('/analytics/api/bots/<int:bot_id>/timeseries')
+@login_required
+def bot_timeseries_api(bot_id):
+    bot = Bot.query.get(bot_id)
+    
+    if not bot or bot.user_id != session['user_id']:
+        return jsonify({'error': 'Bot not found'}), 404
+    
+    bucket = request.args.get('bucket', 'hour')
+    if bucket not in BUCKET_SIZES:
+        return jsonify({'error': 'bucket must be hour or day'}), 400
+    
+    try:
+        end = _parse_time(request.args.get('end')) or datetime.utcnow()
+        start = _parse_time(request.args.get('start')) or end - DEFAULT_WINDOWS[bucket]
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+    
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    if (end - start) / BUCKET_SIZES[bucket] > MAX_BUCKETS:
+        return jsonify({'error': f'Window is limited to {MAX_BUCKETS} buckets'}), 400
+    
+    buckets = bot_timeseries(bot_id, bucket, start, end)
+    
+    return jsonify({
+        'bot_id': bot_id,
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': {
+            'incoming': sum(item['incoming'] for item in buckets),
+            'outgoing': sum(item['outgoing'] for item in buckets)
+        },
+        'buckets': buckets
+    })
@@ -1,11 +1,17 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify
 from models import db
 from models.bot import Bot
-from models.rule import Rule
-from models.message_log import MessageLog
+from services.rule_matcher import get_matcher, match_response
+from services.log_writer import log_writer, write_logs
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+def _find_bot(bot_id):
+    if bot_id:
+        return Bot.query.filter_by(id=bot_id, active=True).first()
+    return Bot.query.filter_by(active=True).first()
+
 @api_bp.route('/get_response', methods=['POST'])
 def get_response():
     data = request.get_json()
@@ -15,39 +21,73 @@ def get_response():
     
     sender = data['sender']
     message = data['message'].strip()
-    bot_id = data.get('bot_id')
     
-    if bot_id:
-        active_bot = Bot.query.filter_by(id=bot_id, active=True).first()
-    else:
-        active_bot = Bot.query.filter_by(active=True).first()
+    active_bot = _find_bot(data.get('bot_id'))
     
     if not active_bot:
         return jsonify({'response': 'No active bot found'}), 404
     
-    incoming_log = MessageLog(
-        bot_id=active_bot.id,
-        sender=sender,
-        direction='incoming',
-        message=message
-    )
-    db.session.add(incoming_log)
-    
-    response_text = active_bot.fallback_message
-    
-    rules = Rule.query.filter_by(bot_id=active_bot.id).all()
-    for rule in rules:
-        if rule.keyword.lower() in message.lower():
-            response_text = rule.response
-            break
+    response_text = match_response(active_bot, message)
     
-    outgoing_log = MessageLog(
-        bot_id=active_bot.id,
-        sender=sender,
-        direction='outgoing',
-        message=response_text
-    )
-    db.session.add(outgoing_log)
+    log_writer.record_many([
+        (active_bot.id, sender, 'incoming', message),
+        (active_bot.id, sender, 'outgoing', response_text)
+    ])
     db.session.commit()
     
     return jsonify({'response': response_text})
+
+@api_bp.route('/get_response/batch', methods=['POST'])
+def get_response_batch():
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or not isinstance(data.get('messages'), list):
+        return jsonify({'error': 'Invalid request'}), 400
+
+    items = data['messages']
+    limit = current_app.config.get('API_BATCH_MAX_MESSAGES', 50000)
+    if len(items) > limit:
+        return jsonify({'error': f'A batch can hold at most {limit} messages'}), 413
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('sender'), str) \
+                or not isinstance(item.get('message'), str):
+            return jsonify({'error': 'Invalid message', 'index': index}), 400
+
+    active_bot = _find_bot(data.get('bot_id'))
+
+    if not active_bot:
+        return jsonify({'response': 'No active bot found'}), 404
+
+    dry_run = bool(data.get('dry_run'))
+    matcher = get_matcher(active_bot)
+
+    results = []
+    rows = []
+    for item in items:
+        sender = item['sender']
+        message = item['message'].strip()
+        response_text = matcher.match(message)
+        matched = response_text is not None
+        if not matched:
+            response_text = active_bot.fallback_message
+        results.append({'sender': sender, 'response': response_text, 'matched': matched})
+
+        if not dry_run:
+            timestamp = datetime.utcnow()
+            rows.append({'bot_id': active_bot.id, 'sender': sender, 'direction': 'incoming',
+                         'message': message, 'timestamp': timestamp})
+            rows.append({'bot_id': active_bot.id, 'sender': sender, 'direction': 'outgoing',
+                         'message': response_text, 'timestamp': timestamp})
+
+    if rows:
+        # One bulk insert for the whole batch, committed at once
+        write_logs(rows)
+        db.session.commit()
+
+    return jsonify({
+        'bot_id': active_bot.id,
+        'dry_run': dry_run,
+        'logged': len(rows),
+        'results': results
+    })
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from models import db
 from models.user import User
+from services.routing import invalidate_phone_number
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -28,6 +29,7 @@ def register():
     user.set_password(password)
     db.session.add(user)
     db.session.commit()
+    invalidate_phone_number(user.phone_number)
 
     session['user_id'] = user.id
     session['username'] = user.username
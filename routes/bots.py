@@ -1,11 +1,30 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, render_template, request, redirect, url_for, session, flash, stream_with_context
+from sqlalchemy import func, tuple_
 from models import db
 from models.bot import Bot
 from models.rule import Rule
+from models.message_log import MessageLog
+from models.bot_sender import BotSender
 from models.user import User
+from services.rule_matcher import invalidate_matcher
+from services.menus import invalidate_menus
+from services.senders import forget_bot_senders
+from services.timeseries import forget_bot_timeseries
+from services.rule_import import RuleImportError, apply_import, parse_rules, plan_import
+from services.routing import invalidate_phone_number, invalidate_user_routes
+from utils.pagination import decode_cursor, keyset_page
 
 bots_bp = Blueprint('bots', __name__)
 
+BOTS_PER_PAGE = 24
+RULES_PER_PAGE = 100
+SENDERS_PER_PAGE = 50
+MESSAGES_PER_PAGE = 50
+
 def login_required(f):
     def wrapper(*args, **kwargs):
         if 'user_id' not in session:
@@ -15,6 +34,13 @@ def login_required(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+def _bot_changed(bot):
+    # Other workers notice through the bumped bot version once their
+    # routing cache refreshes; this worker drops its copies right away.
+    invalidate_matcher(bot.id)
+    invalidate_menus(bot.id)
+    invalidate_user_routes(bot.user_id)
+
 @bots_bp.route('/guide')
 @login_required
 def guide():
@@ -30,8 +56,19 @@ def dashboard():
         session.clear()
         return redirect(url_for('auth.index'))
     
-    bots = Bot.query.filter_by(user_id=session['user_id']).all()
-    return render_template('dashboard.html', bots=bots, user=user)
+    page = keyset_page(
+        Bot.query.filter_by(user_id=user.id), [Bot.id], lambda bot: (bot.id,),
+        after=decode_cursor(request.args.get('after'), (int,)),
+        before=decode_cursor(request.args.get('before'), (int,)),
+        per_page=BOTS_PER_PAGE
+    )
+    # One grouped count for the page instead of loading every bot's rules
+    rule_counts = dict(
+        db.session.query(Rule.bot_id, func.count(Rule.id))
+        .filter(Rule.bot_id.in_([bot.id for bot in page.items]))
+        .group_by(Rule.bot_id)
+    ) if page.items else {}
+    return render_template('dashboard.html', bots=page.items, page=page, rule_counts=rule_counts, user=user)
 
 @bots_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -45,8 +82,12 @@ def profile():
     
     if request.method == 'POST':
         phone_number = request.form.get('phone_number', '').strip()
+        previous_phone_number = user.phone_number
         user.phone_number = phone_number if phone_number else None
         db.session.commit()
+        invalidate_user_routes(user.id)
+        invalidate_phone_number(previous_phone_number)
+        invalidate_phone_number(user.phone_number)
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('bots.dashboard'))
     
@@ -73,6 +114,7 @@ def create_bot():
     )
     db.session.add(bot)
     db.session.commit()
+    invalidate_user_routes(bot.user_id)
     
     flash(f'Bot "{name}" created successfully!', 'success')
     return redirect(url_for('bots.dashboard'))
@@ -87,16 +129,30 @@ def edit_bot(bot_id):
         return redirect(url_for('bots.dashboard'))
     
     if request.method == 'POST':
+        retention_days = request.form.get('retention_days', '').strip()
+        if retention_days and (not retention_days.isdigit() or int(retention_days) < 1):
+            flash('Message history must be kept for at least 1 day', 'danger')
+            return redirect(url_for('bots.edit_bot', bot_id=bot_id))
+        
         bot.name = request.form.get('name', '').strip()
         bot.fallback_message = request.form.get('fallback_message', '').strip()
         bot.active = request.form.get('active') == 'on'
+        bot.retention_days = int(retention_days) if retention_days else None
+        bot.bump_version()
         
         db.session.commit()
+        _bot_changed(bot)
         flash(f'Bot "{bot.name}" updated successfully!', 'success')
         return redirect(url_for('bots.dashboard'))
     
-    rules = Rule.query.filter_by(bot_id=bot_id).all()
-    return render_template('edit_bot.html', bot=bot, rules=rules)
+    page = keyset_page(
+        Rule.query.filter_by(bot_id=bot_id), [Rule.id], lambda rule: (rule.id,),
+        after=decode_cursor(request.args.get('after'), (int,)),
+        before=decode_cursor(request.args.get('before'), (int,)),
+        per_page=RULES_PER_PAGE
+    )
+    rule_count = db.session.query(func.count(Rule.id)).filter(Rule.bot_id == bot_id).scalar()
+    return render_template('edit_bot.html', bot=bot, rules=page.items, page=page, rule_count=rule_count)
 
 @bots_bp.route('/bot/<int:bot_id>/delete', methods=['POST'])
 @login_required
@@ -110,6 +166,9 @@ def delete_bot(bot_id):
     bot_name = bot.name
     db.session.delete(bot)
     db.session.commit()
+    _bot_changed(bot)
+    forget_bot_senders(bot_id)
+    forget_bot_timeseries(bot_id)
     
     flash(f'Bot "{bot_name}" deleted successfully!', 'success')
     return redirect(url_for('bots.dashboard'))
@@ -132,7 +191,9 @@ def add_rule(bot_id):
     
     rule = Rule(bot_id=bot_id, keyword=keyword, response=response)
     db.session.add(rule)
+    bot.bump_version()
     db.session.commit()
+    _bot_changed(bot)
     
     flash(f'Rule added successfully!', 'success')
     return redirect(url_for('bots.edit_bot', bot_id=bot_id))
@@ -148,7 +209,221 @@ def delete_rule(rule_id):
         return redirect(url_for('bots.dashboard'))
     
     db.session.delete(rule)
+    bot.bump_version()
     db.session.commit()
+    _bot_changed(bot)
     
     flash('Rule deleted successfully!', 'success')
     return redirect(url_for('bots.edit_bot', bot_id=bot.id))
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value)
+
+@bots_bp.route('/bot/<int:bot_id>/conversations')
+@login_required
+def conversations(bot_id):
+    bot = Bot.query.get_or_404(bot_id)
+    
+    if bot.user_id != session['user_id']:
+        flash('Unauthorized access', 'danger')
+        return redirect(url_for('bots.dashboard'))
+    
+    # Most recently active first, over the (bot_id, last_seen, sender) index
+    page = keyset_page(
+        BotSender.query.filter_by(bot_id=bot_id),
+        [BotSender.last_seen, BotSender.sender],
+        lambda sender: (sender.last_seen, sender.sender),
+        after=decode_cursor(request.args.get('after'), (_parse_timestamp, str)),
+        before=decode_cursor(request.args.get('before'), (_parse_timestamp, str)),
+        per_page=SENDERS_PER_PAGE,
+        descending=True
+    )
+    return render_template('conversations.html', bot=bot, senders=page.items, page=page)
+
+@bots_bp.route('/bot/<int:bot_id>/conversations/<path:sender>')
+@login_required
+def conversation(bot_id, sender):
+    bot = Bot.query.get_or_404(bot_id)
+    
+    if bot.user_id != session['user_id']:
+        flash('Unauthorized access', 'danger')
+        return redirect(url_for('bots.dashboard'))
+    
+    # Newest first on (timestamp, id) over the (bot_id, sender, timestamp)
+    # index; older pages are reached through the cursor, never OFFSET.
+    query = db.session.query(
+        MessageLog.id, MessageLog.timestamp, MessageLog.direction, MessageLog.message
+    ).filter(MessageLog.bot_id == bot_id, MessageLog.sender == sender, MessageLog.timestamp.isnot(None))
+    page = keyset_page(
+        query, [MessageLog.timestamp, MessageLog.id], lambda row: (row.timestamp, row.id),
+        after=decode_cursor(request.args.get('after'), (_parse_timestamp, int)),
+        before=decode_cursor(request.args.get('before'), (_parse_timestamp, int)),
+        per_page=MESSAGES_PER_PAGE,
+        descending=True
+    )
+    summary = db.session.get(BotSender, (bot_id, sender))
+    return render_template('conversation.html', bot=bot, sender=sender, summary=summary,
+                           messages=list(reversed(page.items)), page=page)
+
+EXPORT_COLUMNS = ['id', 'timestamp', 'direction', 'sender', 'message']
+EXPORT_CHUNK_SIZE = 1000
+
+def _parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def _export_pages(query):
+    # Keyset pagination on (timestamp, id) over the (bot_id, timestamp)
+    # index: every page is a short index range scan, however deep the
+    # export goes, and only one page of rows is held in memory.
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.filter(tuple_(MessageLog.timestamp, MessageLog.id) > last)
+        rows = page.order_by(MessageLog.timestamp, MessageLog.id).limit(EXPORT_CHUNK_SIZE).all()
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1].timestamp, rows[-1].id)
+
+def _export_csv(pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in pages:
+        for row in rows:
+            writer.writerow([row.id, row.timestamp.isoformat(), row.direction, row.sender, row.message])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _export_jsonl(pages):
+    for rows in pages:
+        yield ''.join(
+            json.dumps({
+                'id': row.id,
+                'timestamp': row.timestamp.isoformat(),
+                'direction': row.direction,
+                'sender': row.sender,
+                'message': row.message
+            }, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+@bots_bp.route('/bot/<int:bot_id>/export')
+@login_required
+def export_logs(bot_id):
+    bot = Bot.query.get_or_404(bot_id)
+    
+    if bot.user_id != session['user_id']:
+        flash('Unauthorized access', 'danger')
+        return redirect(url_for('bots.dashboard'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        flash('Export format must be csv or jsonl', 'danger')
+        return redirect(url_for('bots.edit_bot', bot_id=bot_id))
+    
+    try:
+        start = _parse_day(request.args.get('start'))
+        end = _parse_day(request.args.get('end'))
+    except ValueError:
+        flash('Dates must use the YYYY-MM-DD format', 'danger')
+        return redirect(url_for('bots.edit_bot', bot_id=bot_id))
+    
+    query = db.session.query(
+        MessageLog.id, MessageLog.timestamp, MessageLog.direction, MessageLog.sender, MessageLog.message
+    ).filter(MessageLog.bot_id == bot_id, MessageLog.timestamp.isnot(None))
+    
+    if start:
+        query = query.filter(MessageLog.timestamp >= start)
+    if end:
+        query = query.filter(MessageLog.timestamp < end + timedelta(days=1))
+    if request.args.get('sender'):
+        query = query.filter(MessageLog.sender == request.args['sender'])
+    if request.args.get('direction') in ('incoming', 'outgoing'):
+        query = query.filter(MessageLog.direction == request.args['direction'])
+    
+    pages = _export_pages(query)
+    if export_format == 'csv':
+        body, mimetype = _export_csv(pages), 'text/csv'
+    else:
+        body, mimetype = _export_jsonl(pages), 'application/x-ndjson'
+    
+    filename = f'bot_{bot_id}_messages.{export_format}'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@bots_bp.route('/bot/<int:bot_id>/rules/export')
+@login_required
+def export_rules(bot_id):
+    bot = Bot.query.get_or_404(bot_id)
+    
+    if bot.user_id != session['user_id']:
+        flash('Unauthorized access', 'danger')
+        return redirect(url_for('bots.dashboard'))
+    
+    rules = db.session.query(Rule.keyword, Rule.response).filter_by(bot_id=bot_id).order_by(Rule.id).all()
+    
+    if request.args.get('format') == 'json':
+        body = json.dumps([{'keyword': keyword, 'response': response} for keyword, response in rules], ensure_ascii=False, indent=2)
+        mimetype, extension = 'application/json', 'json'
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['keyword', 'response'])
+        writer.writerows(rules)
+        body = buffer.getvalue()
+        mimetype, extension = 'text/csv', 'csv'
+    
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="bot_{bot_id}_rules.{extension}"'}
+    )
+
+@bots_bp.route('/bot/<int:bot_id>/rules/import', methods=['POST'])
+@login_required
+def import_rules(bot_id):
+    bot = Bot.query.get_or_404(bot_id)
+    
+    if bot.user_id != session['user_id']:
+        flash('Unauthorized access', 'danger')
+        return redirect(url_for('bots.dashboard'))
+    
+    replace = request.form.get('mode') == 'replace'
+    dry_run = request.form.get('dry_run') == 'on'
+    
+    try:
+        if request.form.get('rules_json'):
+            # Confirmation of a dry run: the parsed rules come back as JSON
+            rules = parse_rules(request.form['rules_json'], 'json')
+        else:
+            upload = request.files.get('rules_file')
+            if not upload or not upload.filename:
+                flash('Choose a CSV or JSON file to import', 'danger')
+                return redirect(url_for('bots.edit_bot', bot_id=bot_id))
+            file_format = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+            rules = parse_rules(upload.read().decode('utf-8-sig'), file_format)
+    except (RuleImportError, UnicodeDecodeError) as e:
+        flash(f'Could not import rules: {e}', 'danger')
+        return redirect(url_for('bots.edit_bot', bot_id=bot_id))
+    
+    plan = plan_import(bot_id, rules, replace=replace)
+    
+    if dry_run:
+        rules_json = json.dumps([{'keyword': keyword, 'response': response} for keyword, response in rules], ensure_ascii=False)
+        return render_template('import_rules.html', bot=bot, plan=plan, replace=replace, rules_json=rules_json)
+    
+    apply_import(bot_id, plan)
+    bot.bump_version()
+    db.session.commit()
+    _bot_changed(bot)
+    
+    flash(f"Rules imported: {len(plan['add'])} added, {len(plan['update'])} updated, "
+          f"{len(plan['delete'])} deleted, {plan['unchanged']} unchanged.", 'success')
+    return redirect(url_for('bots.edit_bot', bot_id=bot_id))
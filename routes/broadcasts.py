@@ -0,0 +1,128 @@
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify
+from models import db
+from models.broadcast import Broadcast, BroadcastRecipient
+from models.user import User
+from services.broadcast import broadcast_runner, create_broadcast, parse_recipients
+from services.whatsapp_service import WhatsAppService
+
+broadcasts_bp = Blueprint('broadcasts', __name__, url_prefix='/broadcasts')
+
+def login_required(f):
+    def wrapper(*args, **kwargs):
+        if 'user_id' not in session:
+            if request.is_json:
+                return jsonify({'error': 'Login required'}), 401
+            flash('Please login first', 'warning')
+            return redirect(url_for('auth.index'))
+        return f(*args, **kwargs)
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+def _get_broadcast(broadcast_id):
+    return Broadcast.query.filter_by(id=broadcast_id, user_id=session['user_id']).first()
+
+@broadcasts_bp.route('/', methods=['GET'])
+@login_required
+def broadcasts():
+    user_broadcasts = Broadcast.query.filter_by(user_id=session['user_id']).order_by(Broadcast.id.desc()).limit(50).all()
+    return render_template('broadcasts.html', broadcasts=user_broadcasts,
+                           max_recipients=current_app.config['BROADCAST_MAX_RECIPIENTS'])
+
+@broadcasts_bp.route('/', methods=['POST'])
+@login_required
+def create():
+    """Create and start a broadcast from a form (pasted or uploaded numbers)
+    or from JSON: {"message": "...", "recipients": ["+1555...", ...]}."""
+    if request.is_json:
+        data = request.get_json() or {}
+        message = (data.get('message') or '').strip()
+        recipients_data = data.get('recipients') or []
+        if isinstance(recipients_data, list):
+            # Numbers sent as JSON integers are fine; anything else is not a number
+            for index, item in enumerate(recipients_data):
+                if isinstance(item, bool) or not isinstance(item, (str, int)):
+                    return jsonify({'error': 'Recipients must be strings or integers', 'index': index}), 400
+            text = '\n'.join(str(item) for item in recipients_data)
+        else:
+            text = str(recipients_data)
+    else:
+        message = request.form.get('message', '').strip()
+        text = request.form.get('recipients', '')
+        upload = request.files.get('recipients_file')
+        if upload and upload.filename:
+            text += '\n' + upload.read().decode('utf-8-sig', errors='replace')
+
+    recipients, invalid = parse_recipients(text)
+    max_recipients = current_app.config['BROADCAST_MAX_RECIPIENTS']
+
+    error = None
+    if not message:
+        error = 'Message is required'
+    elif not recipients:
+        error = 'No valid recipient numbers found'
+    elif len(recipients) > max_recipients:
+        error = f'A broadcast can have at most {max_recipients} recipients'
+
+    user = User.query.get(session['user_id'])
+    service = WhatsAppService(user)
+    if not error and not service.is_configured():
+        error = 'Configure your WhatsApp credentials in Settings before broadcasting'
+
+    if error:
+        if request.is_json:
+            return jsonify({'error': error, 'invalid': invalid[:100]}), 400
+        flash(error, 'danger')
+        return redirect(url_for('broadcasts.broadcasts'))
+
+    broadcast = create_broadcast(user, message, recipients, service.provider)
+    broadcast_runner.start(broadcast.id)
+
+    if request.is_json:
+        result = broadcast.to_dict()
+        result['invalid'] = invalid[:100]
+        result['progress_url'] = url_for('broadcasts.progress', broadcast_id=broadcast.id)
+        return jsonify(result), 202
+
+    if invalid:
+        flash(f'Skipped {len(invalid)} invalid numbers: {", ".join(invalid[:5])}{"..." if len(invalid) > 5 else ""}', 'warning')
+    flash(f'Broadcast started to {len(recipients)} recipients.', 'success')
+    return redirect(url_for('broadcasts.detail', broadcast_id=broadcast.id))
+
+@broadcasts_bp.route('/<int:broadcast_id>')
+@login_required
+def detail(broadcast_id):
+    broadcast = _get_broadcast(broadcast_id)
+    if not broadcast:
+        flash('Broadcast not found', 'danger')
+        return redirect(url_for('broadcasts.broadcasts'))
+
+    failures = BroadcastRecipient.query.filter_by(broadcast_id=broadcast.id, status='failed') \
+        .order_by(BroadcastRecipient.id).limit(50).all()
+    return render_template('broadcast.html', broadcast=broadcast, failures=failures)
+
+@broadcasts_bp.route('/<int:broadcast_id>/progress')
+@login_required
+def progress(broadcast_id):
+    broadcast = _get_broadcast(broadcast_id)
+    if not broadcast:
+        return jsonify({'error': 'Broadcast not found'}), 404
+    return jsonify(broadcast.to_dict())
+
+@broadcasts_bp.route('/<int:broadcast_id>/cancel', methods=['POST'])
+@login_required
+def cancel(broadcast_id):
+    broadcast = _get_broadcast(broadcast_id)
+    if broadcast and broadcast.status in ('pending', 'running'):
+        broadcast.status = 'cancelled'
+        db.session.commit()
+        flash('Broadcast cancelled. Messages already sent cannot be recalled.', 'info')
+    return redirect(url_for('broadcasts.detail', broadcast_id=broadcast_id))
+
+@broadcasts_bp.route('/<int:broadcast_id>/resume', methods=['POST'])
+@login_required
+def resume(broadcast_id):
+    broadcast = _get_broadcast(broadcast_id)
+    if broadcast and broadcast.status == 'pending':
+        broadcast_runner.start(broadcast.id)
+        flash('Broadcast resumed.', 'success')
+    return redirect(url_for('broadcasts.detail', broadcast_id=broadcast_id))
@@ -0,0 +1,32 @@
+import hmac
+from flask import Blueprint, Response, current_app, request
+from services.dispatcher import dispatcher
+from services.log_writer import log_writer
+from services.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _background_metrics():
+    stats = dispatcher.stats()
+    return [
+        ('gauge', 'outbound_queue_depth', {}, stats['queue_depth']),
+        ('gauge', 'outbound_in_flight', {}, stats['in_flight']),
+        ('gauge', 'outbound_workers', {}, stats['workers']),
+        ('counter', 'outbound_sent_total', {}, stats['sent']),
+        ('counter', 'outbound_failed_total', {}, stats['failed']),
+        ('counter', 'outbound_sent_inline_total', {}, stats['sent_inline']),
+        ('gauge', 'message_log_pending', {}, log_writer.pending()),
+        ('counter', 'message_log_dropped_total', {}, log_writer.dropped)
+    ]
+
+metrics.register_collector(_background_metrics)
+
+@metrics_bp.route('/metrics')
+def metrics_endpoint():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, token):
+            return 'Unauthorized', 403
+
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,11 +1,16 @@
 
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from sqlalchemy.exc import IntegrityError
 from models import db
-from models.user import User
+from models.user import User, normalize_phone_number
+from services.whatsapp_service import evict_clients
+from services.routing import invalidate_twilio_number, invalidate_user_routes
 import os
 
 settings_bp = Blueprint('settings', __name__)
 
+TWILIO_NUMBER_TAKEN = 'That WhatsApp number is already connected to another account.'
+
 def login_required(f):
     def wrapper(*args, **kwargs):
         if 'user_id' not in session:
@@ -15,6 +20,30 @@ def login_required(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+def _twilio_number_taken(user, whatsapp_number):
+    number = normalize_phone_number(whatsapp_number)
+    if not number:
+        return False
+    return db.session.query(
+        User.query.filter(User.twilio_number_normalized == number, User.id != user.id).exists()
+    ).scalar()
+
+def _commit_twilio_number():
+    """Commit a Twilio settings change. Returns False if another account saved
+    the same number in the meantime (the unique index rejects it)."""
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        flash(TWILIO_NUMBER_TAKEN, 'danger')
+        return False
+
+def _twilio_routing_changed(user, previous_number):
+    invalidate_twilio_number(previous_number)
+    invalidate_twilio_number(user.twilio_whatsapp_number)
+    invalidate_user_routes(user.id)
+
 @settings_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
@@ -49,6 +78,7 @@ def settings():
                     )
                     user.whatsapp_provider = 'meta'
                     db.session.commit()
+                    evict_clients(user.id)
                     flash('Meta Cloud API credentials saved successfully!', 'success')
                 elif user.has_meta_credentials():
                     if meta_api_version and meta_api_version != user.meta_api_version:
@@ -67,20 +97,27 @@ def settings():
                 twilio_auth_token = request.form.get('twilio_auth_token', '').strip()
                 twilio_whatsapp_number = request.form.get('twilio_whatsapp_number', '').strip()
                 
-                if twilio_account_sid and twilio_auth_token:
+                previous_number = user.twilio_whatsapp_number
+                
+                if twilio_whatsapp_number and _twilio_number_taken(user, twilio_whatsapp_number):
+                    flash(TWILIO_NUMBER_TAKEN, 'danger')
+                elif twilio_account_sid and twilio_auth_token:
                     user.set_twilio_credentials(
                         twilio_account_sid,
                         twilio_auth_token,
                         twilio_whatsapp_number if twilio_whatsapp_number else None
                     )
                     user.whatsapp_provider = 'twilio'
-                    db.session.commit()
-                    flash('Twilio credentials saved successfully!', 'success')
+                    if _commit_twilio_number():
+                        evict_clients(user.id)
+                        _twilio_routing_changed(user, previous_number)
+                        flash('Twilio credentials saved successfully!', 'success')
                 elif user.has_twilio_credentials():
                     if twilio_whatsapp_number and twilio_whatsapp_number != user.twilio_whatsapp_number:
-                        user.twilio_whatsapp_number = twilio_whatsapp_number
-                        db.session.commit()
-                        flash('Twilio WhatsApp number updated!', 'success')
+                        user.set_twilio_number(twilio_whatsapp_number)
+                        if _commit_twilio_number():
+                            _twilio_routing_changed(user, previous_number)
+                            flash('Twilio WhatsApp number updated!', 'success')
                     else:
                         user.whatsapp_provider = 'twilio'
                         db.session.commit()
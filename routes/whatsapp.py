@@ -1,23 +1,58 @@
 import os
 import hashlib
 import hmac
+from functools import wraps
 from flask import Blueprint, request, jsonify
-from twilio.twiml.messaging_response import MessagingResponse
-from twilio.request_validator import RequestValidator
 from models import db
-from models.bot import Bot
-from models.rule import Rule
-from models.message_log import MessageLog
 from models.user import User
 from services.whatsapp_service import WhatsAppService
+from services.dispatcher import dispatcher
+from services.rule_matcher import find_response
+from services.metrics import metrics
+from services.menus import get_menu_page, parse_menu_page
+from services.senders import is_new_conversation
+from services.log_writer import log_writer
+from services.dedup import claim_messages, remember_messages
+from services.routing import resolve_default_bot, resolve_senders, resolve_twilio_number
 
 whatsapp_bp = Blueprint('whatsapp', __name__, url_prefix='/whatsapp')
 
-def validate_twilio_request():
-    auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
+def _timed_webhook(provider):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with metrics.timer('whatsapp_webhook_seconds', provider=provider):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _stage(provider, stage):
+    return metrics.timer('whatsapp_webhook_stage_seconds', provider=provider, stage=stage)
+
+def _match(active_bot, message_body, provider):
+    response = find_response(active_bot, message_body)
+    metrics.inc('whatsapp_replies_total', provider=provider, outcome='rule' if response is not None else 'fallback')
+    return response if response is not None else active_bot.fallback_message
+
+def _twiml(message=None):
+    # Imported on first use so workers that only serve Meta never load the
+    # Twilio SDK
+    from twilio.twiml.messaging_response import MessagingResponse
+
+    response = MessagingResponse()
+    if message is not None:
+        response.message(message)
+    return str(response)
+
+def validate_twilio_request(auth_token=None):
+    """Check X-Twilio-Signature with the tenant's auth token, falling back
+    to the global TWILIO_AUTH_TOKEN."""
+    auth_token = auth_token or os.environ.get('TWILIO_AUTH_TOKEN')
     if not auth_token:
         return True
     
+    from twilio.request_validator import RequestValidator
+
     validator = RequestValidator(auth_token)
     url = request.url
     signature = request.headers.get('X-Twilio-Signature', '')
@@ -46,69 +81,68 @@ def validate_meta_signature():
     return hmac.compare_digest(signature, expected_signature)
 
 @whatsapp_bp.route('/webhook/twilio', methods=['POST'])
+@_timed_webhook('twilio')
 def twilio_webhook():
-    if not validate_twilio_request():
+    # Route by the number the message was sent to; numbers no user has
+    # claimed fall back to the single-tenant setup (first active bot)
+    with _stage('twilio', 'routing'):
+        route = resolve_twilio_number(request.values.get('To', ''))
+        if not route.user_id:
+            route = resolve_default_bot()
+    
+    with _stage('twilio', 'signature'):
+        valid = validate_twilio_request(getattr(route, 'auth_token', None))
+    if not valid:
         return 'Unauthorized', 403
     
+    # Drop redeliveries of a message we already answered
+    message_sid = request.values.get('MessageSid')
+    if message_sid:
+        with _stage('twilio', 'dedup'):
+            is_new = bool(claim_messages('twilio', [message_sid]))
+        if not is_new:
+            metrics.inc('whatsapp_duplicates_total', provider='twilio')
+            return _twiml()
+    
     incoming_msg = request.values.get('Body', '').strip()
     from_number = request.values.get('From', '')
+    metrics.inc('whatsapp_messages_total', provider='twilio')
     
-    active_bot = Bot.query.filter_by(active=True).first()
+    active_bot = route.bot
     
     if not active_bot:
-        response = MessagingResponse()
-        response.message('No active bot found. Please contact administrator.')
-        return str(response)
-    
-    incoming_log = MessageLog(
-        bot_id=active_bot.id,
-        sender=from_number,
-        direction='incoming',
-        message=incoming_msg
-    )
-    db.session.add(incoming_log)
+        metrics.inc('whatsapp_replies_total', provider='twilio', outcome='no_bot')
+        return _twiml('No active bot found. Please contact administrator.')
     
     # Check if this is the bot owner's registered number
     clean_number = from_number.replace('whatsapp:', '')
-    bot_owner = User.query.get(active_bot.user_id)
+    owner_phone = route.phone_number
     
     # Send welcome message with commands if it's a start/help command or first message
-    is_start_command = incoming_msg.lower() in ['start', 'help', 'menu', 'commands']
-    is_owner = bot_owner and bot_owner.phone_number and clean_number.endswith(bot_owner.phone_number.replace('+', '').replace('-', ''))
+    menu_page = parse_menu_page(incoming_msg, ['start', 'help', 'menu', 'commands'])
+    is_owner = owner_phone and clean_number.endswith(owner_phone.replace('+', '').replace('-', ''))
+    is_first_message = is_owner and is_new_conversation(active_bot.id, from_number)
     
-    if is_start_command or (is_owner and MessageLog.query.filter_by(bot_id=active_bot.id, sender=from_number).count() <= 1):
-        rules = Rule.query.filter_by(bot_id=active_bot.id).all()
-        if rules:
-            response_text = f"Welcome to {active_bot.name}! 🤖\n\nAvailable commands:\n\n"
-            for rule in rules:
-                response_text += f"• {rule.keyword}: {rule.response[:50]}{'...' if len(rule.response) > 50 else ''}\n"
-            response_text += f"\nType any keyword to get started, or send any message for general assistance."
+    with _stage('twilio', 'matching'):
+        if menu_page or is_first_message:
+            response_text = get_menu_page(active_bot, 'twilio', menu_page or 1)
+            metrics.inc('whatsapp_replies_total', provider='twilio', outcome='menu')
         else:
-            response_text = f"Welcome to {active_bot.name}! 🤖\n\nNo commands configured yet. Send any message to interact with the bot."
-    else:
-        response_text = active_bot.fallback_message
-        
-        rules = Rule.query.filter_by(bot_id=active_bot.id).all()
-        for rule in rules:
-            if rule.keyword.lower() in incoming_msg.lower():
-                response_text = rule.response
-                break
+            response_text = _match(active_bot, incoming_msg, 'twilio')
     
-    outgoing_log = MessageLog(
-        bot_id=active_bot.id,
-        sender=from_number,
-        direction='outgoing',
-        message=response_text
-    )
-    db.session.add(outgoing_log)
-    db.session.commit()
+    with _stage('twilio', 'log_commit'):
+        log_writer.record_many([
+            (active_bot.id, from_number, 'incoming', incoming_msg),
+            (active_bot.id, from_number, 'outgoing', response_text)
+        ])
+        db.session.commit()
+    if message_sid:
+        remember_messages('twilio', [message_sid])
     
-    response = MessagingResponse()
-    response.message(response_text)
-    
-    return str(response)
+    return _twiml(response_text)
 
 @whatsapp_bp.route('/webhook/meta', methods=['GET', 'POST'])
+@_timed_webhook('meta')
 def meta_webhook():
     if request.method == 'GET':
         mode = request.args.get('hub.mode')
@@ -127,85 +161,104 @@ def meta_webhook():
             return 'Forbidden', 403
 
     elif request.method == 'POST':
-        if not validate_meta_signature():
+        with _stage('meta', 'signature'):
+            valid = validate_meta_signature()
+        if not valid:
             return 'Unauthorized', 403
 
         data = request.get_json()
 
         try:
-            entry = data['entry'][0]
-            changes = entry['changes'][0]
-            value = changes['value']
+            # Meta batches several entries, changes and messages into one
+            # delivery under load, so handle every message in the payload
+            messages = [
+                message
+                for entry in data.get('entry', [])
+                for change in entry.get('changes', [])
+                for message in change.get('value', {}).get('messages', [])
+            ]
 
-            if 'messages' in value:
-                message = value['messages'][0]
+            if not messages:
+                return jsonify({'status': 'ok'}), 200
+
+            # Meta redelivers on timeouts and errors; skip message ids that
+            # were already processed before doing any other work
+            with _stage('meta', 'dedup'):
+                new_ids = claim_messages('meta', [message.get('id') for message in messages])
+            unclaimed = set(new_ids)
+            fresh = []
+            for message in messages:
+                message_id = message.get('id')
+                if not message_id:
+                    fresh.append(message)
+                elif message_id in unclaimed:
+                    unclaimed.discard(message_id)
+                    fresh.append(message)
+            if len(fresh) < len(messages):
+                metrics.inc('whatsapp_duplicates_total', len(messages) - len(fresh), provider='meta')
+            messages = fresh
+
+            if not messages:
+                return jsonify({'status': 'ok'}), 200
+
+            metrics.inc('whatsapp_messages_total', len(messages), provider='meta')
+
+            # Find users and active bots for every sender in one go
+            with _stage('meta', 'routing'):
+                routes = resolve_senders({message['from'] for message in messages})
+            replies = []
+            rows = []
+
+            for message in messages:
                 from_number = message['from']
                 message_body = message.get('text', {}).get('body', '').strip()
+                route = routes[from_number]
 
-                # Find user by phone number
-                user = User.query.filter_by(phone_number=from_number).first()
-
-                if not user:
+                if not route.user_id:
                     # User not registered, send welcome message (use fallback to env vars)
-                    whatsapp_service = WhatsAppService()
-                    whatsapp_service.send_message(from_number, 
-                        "Welcome! Please register on our platform to use this bot service.")
-                    return jsonify({'status': 'ok'}), 200
+                    metrics.inc('whatsapp_replies_total', provider='meta', outcome='unregistered')
+                    replies.append((None, from_number,
+                        "Welcome! Please register on our platform to use this bot service."))
+                    continue
 
-                # Get user's active bot
-                active_bot = Bot.query.filter_by(user_id=user.id, active=True).first()
+                active_bot = route.bot
 
                 if not active_bot:
-                    # Use user-specific WhatsApp service
-                    whatsapp_service = WhatsAppService(user)
-                    whatsapp_service.send_message(from_number, 
-                        "You don't have an active bot. Please create and activate a bot on the dashboard.")
-                    return jsonify({'status': 'ok'}), 200
-
-                # Log incoming message
-                incoming_log = MessageLog(
-                    bot_id=active_bot.id,
-                    sender=from_number,
-                    direction='incoming',
-                    message=message_body
-                )
-                db.session.add(incoming_log)
-
-                # Check if this is the first message (list commands)
-                if message_body.lower() in ['hi', 'hello', 'start', 'help']:
-                    rules = Rule.query.filter_by(bot_id=active_bot.id).all()
-
-                    if rules:
-                        response_text = f"Available commands for {active_bot.name}:\n\n"
-                        for rule in rules:
-                            response_text += f"• {rule.keyword}: {rule.response}\n"
-                    else:
-                        response_text = "No commands configured yet. Please add rules to your bot on the dashboard."
-                else:
-                    # Find matching rule
-                    response_text = active_bot.fallback_message
-                    rules = Rule.query.filter_by(bot_id=active_bot.id).all()
-
-                    for rule in rules:
-                        if rule.keyword.lower() in message_body.lower():
-                            response_text = rule.response
-                            break
-
-                # Log outgoing message
-                outgoing_log = MessageLog(
-                    bot_id=active_bot.id,
-                    sender=from_number,
-                    direction='outgoing',
-                    message=response_text
+                    metrics.inc('whatsapp_replies_total', provider='meta', outcome='no_bot')
+                    replies.append((route.user_id, from_number,
+                        "You don't have an active bot. Please create and activate a bot on the dashboard."))
+                    continue
+
+                with _stage('meta', 'matching'):
+                    response_text = _meta_response(active_bot, message_body)
+
+                rows.append((active_bot.id, from_number, message_body, response_text))
+                replies.append((route.user_id, from_number, response_text))
+
+            with _stage('meta', 'log_commit'):
+                # One bulk insert and one round of rollup upserts for the batch
+                log_writer.record_many(
+                    entry
+                    for bot_id, from_number, message_body, response_text in rows
+                    for entry in ((bot_id, from_number, 'incoming', message_body),
+                                  (bot_id, from_number, 'outgoing', response_text))
                 )
-                db.session.add(outgoing_log)
                 db.session.commit()
+            remember_messages('meta', new_ids)
 
-                # Send response via WhatsApp using user's credentials
-                whatsapp_service = WhatsAppService(user)
-                whatsapp_service.send_message(from_number, response_text)
+            # Queue the responses via WhatsApp using each user's credentials,
+            # so Meta gets its acknowledgement without waiting on the sends
+            with _stage('meta', 'credentials'):
+                user_ids = {user_id for user_id, _, _ in replies if user_id}
+                users = User.query.filter(User.id.in_(user_ids)).all() if user_ids else []
+                services = {user.id: WhatsAppService(user) for user in users}
+                for user_id, _, _ in replies:
+                    if user_id not in services:
+                        services[user_id] = WhatsAppService()
 
-                return jsonify({'status': 'ok'}), 200
+            with _stage('meta', 'dispatch'):
+                for user_id, from_number, response_text in replies:
+                    dispatcher.send_message(services[user_id], from_number, response_text)
 
             return jsonify({'status': 'ok'}), 200
 
@@ -213,6 +266,16 @@ def meta_webhook():
             print(f'Error processing webhook: {str(e)}')
             return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def _meta_response(active_bot, message_body):
+    # Check if this is the first message (list commands)
+    menu_page = parse_menu_page(message_body, ['hi', 'hello', 'start', 'help'])
+    if menu_page:
+        metrics.inc('whatsapp_replies_total', provider='meta', outcome='menu')
+        return get_menu_page(active_bot, 'meta', menu_page)
+
+    # Find matching rule
+    return _match(active_bot, message_body, 'meta')
+
 @whatsapp_bp.route('/test', methods=['POST'])
 def test_send():
     data = request.get_json()
@@ -0,0 +1,101 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from models import db
+from models.bot import Bot
+from models.message_log import MessageLog
+
+def _partition_path(archive_dir, bot_id, day):
+    return os.path.join(archive_dir, f'bot_{bot_id}', f'{day.isoformat()}.jsonl.gz')
+
+def _serialize(log):
+    return {
+        'id': log.id,
+        'bot_id': log.bot_id,
+        'sender': log.sender,
+        'direction': log.direction,
+        'message': log.message,
+        'timestamp': log.timestamp.isoformat() if log.timestamp else None
+    }
+
+def retention_cutoffs(default_days=None, bot_id=None, now=None):
+    """Map bot id to the timestamp before which its logs should be archived."""
+    now = now or datetime.utcnow()
+    query = Bot.query
+    if bot_id is not None:
+        query = query.filter_by(id=bot_id)
+
+    cutoffs = {}
+    for bot in query.order_by(Bot.id):
+        days = bot.retention_days if bot.retention_days is not None else default_days
+        # A zero or negative retention would archive the whole history
+        if days is not None and days > 0:
+            cutoffs[bot.id] = now - timedelta(days=days)
+    return cutoffs
+
+def archive_bot_logs(bot_id, cutoff, archive_dir, batch_size=1000, pause=0.0):
+    """Move a bot's logs older than ``cutoff`` into gzipped JSONL partitions.
+
+    Rows are written one batch at a time, oldest first, and each batch is
+    deleted in its own short transaction after its partition files are
+    closed, so webhook writes are never locked out for long. Partitions are
+    appended to, so a rerun after a crash may repeat a few rows; each record
+    carries its original id.
+    """
+    archived = 0
+    while True:
+        logs = db.session.scalars(
+            select(MessageLog)
+            .where(MessageLog.bot_id == bot_id, MessageLog.timestamp < cutoff)
+            .order_by(MessageLog.timestamp, MessageLog.id)
+            .limit(batch_size)
+        ).all()
+        if not logs:
+            return archived
+
+        by_day = {}
+        for log in logs:
+            by_day.setdefault(log.timestamp.date(), []).append(_serialize(log))
+
+        for day, records in by_day.items():
+            path = _partition_path(archive_dir, bot_id, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, 'at', encoding='utf-8') as partition:
+                for record in records:
+                    partition.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        ids = [log.id for log in logs]
+        db.session.execute(delete(MessageLog).where(MessageLog.id.in_(ids)))
+        db.session.commit()
+        db.session.expunge_all()
+        archived += len(ids)
+
+        if pause:
+            time.sleep(pause)
+
+def archive_expired_logs(archive_dir, default_days=None, bot_id=None, batch_size=1000, pause=0.0):
+    """Apply per-bot (or default) retention to every bot. Returns rows archived per bot."""
+    results = {}
+    for cutoff_bot_id, cutoff in retention_cutoffs(default_days, bot_id).items():
+        results[cutoff_bot_id] = archive_bot_logs(cutoff_bot_id, cutoff, archive_dir, batch_size, pause)
+    return results
+
+def iter_archived_logs(archive_dir, bot_id, start_day=None, end_day=None):
+    """Stream archived records for a bot, oldest partition first."""
+    bot_dir = os.path.join(archive_dir, f'bot_{bot_id}')
+    if not os.path.isdir(bot_dir):
+        return
+
+    for name in sorted(os.listdir(bot_dir)):
+        if not name.endswith('.jsonl.gz'):
+            continue
+        day = datetime.strptime(name[:-len('.jsonl.gz')], '%Y-%m-%d').date()
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+
+        with gzip.open(os.path.join(bot_dir, name), 'rt', encoding='utf-8') as partition:
+            for line in partition:
+                yield json.loads(line)
@@ -0,0 +1,234 @@
+import atexit
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+from models import db
+from models.broadcast import Broadcast, BroadcastRecipient
+from models.user import User
+from services.rate_limit import CircuitOpenError, RateLimitExceeded
+from services.whatsapp_service import WhatsAppService
+
+class BroadcastDeferred(Exception):
+    """Raised when sends were shed (open circuit or rate limit); the broadcast
+    is back in pending and its unsent recipients are kept for a later run."""
+
+_SEPARATORS = re.compile(r'[\s,;]+')
+_PHONE = re.compile(r'^\+?\d{7,15}$')
+
+def parse_recipients(text):
+    """Split pasted or uploaded numbers on newlines, commas or semicolons.
+
+    Returns (recipients, invalid). Formatting characters are stripped and
+    duplicates dropped, keeping the first occurrence.
+    """
+    recipients = []
+    invalid = []
+    seen = set()
+    for raw in _SEPARATORS.split(text or ''):
+        if not raw:
+            continue
+        number = raw.replace('whatsapp:', '').replace('-', '').replace('(', '').replace(')', '').replace('.', '')
+        if not _PHONE.match(number):
+            invalid.append(raw)
+            continue
+        key = number.lstrip('+')
+        if key in seen:
+            continue
+        seen.add(key)
+        recipients.append(number)
+    return recipients, invalid
+
+def create_broadcast(user, message, recipients, provider):
+    """Store a broadcast and its recipients in one transaction."""
+    broadcast = Broadcast(user_id=user.id, message=message, provider=provider, total=len(recipients))
+    db.session.add(broadcast)
+    db.session.flush()
+    if recipients:
+        db.session.execute(insert(BroadcastRecipient), [
+            {'broadcast_id': broadcast.id, 'phone_number': number, 'status': 'pending'}
+            for number in recipients
+        ])
+    db.session.commit()
+    return broadcast
+
+def _claim(broadcast_id):
+    # Only one thread (in any worker) may run a broadcast at a time.
+    result = db.session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id, Broadcast.status == 'pending')
+        .values(status='running', started_at=func.coalesce(Broadcast.started_at, datetime.utcnow()))
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def requeue_broadcast(broadcast_id):
+    """Put a broadcast stuck in 'running' (its process died) back to pending."""
+    db.session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id, Broadcast.status == 'running')
+        .values(status='pending')
+    )
+    db.session.commit()
+
+def _send(app, service, message, recipient_id, phone_number):
+    try:
+        # Executor threads need their own app context for the rate limiter
+        with app.app_context():
+            message_id = service.send_message(phone_number, message)
+        return {'id': recipient_id, 'status': 'sent', 'message_id': message_id, 'error': None, 'sent_at': datetime.utcnow()}
+    except (CircuitOpenError, RateLimitExceeded) as e:
+        # Shed before reaching the provider: not a failure of this recipient
+        return {'id': recipient_id, 'status': 'pending', 'message_id': None, 'error': str(e)[:500], 'sent_at': None}
+    except Exception as e:
+        return {'id': recipient_id, 'status': 'failed', 'message_id': None, 'error': str(e)[:500], 'sent_at': None}
+
+def run_broadcast(broadcast_id, workers=8, batch_size=500, stopping=None):
+    """Send a claimed broadcast to its pending recipients.
+
+    Recipients are read ``batch_size`` at a time and sent by up to ``workers``
+    threads sharing the user's pooled provider client. Each batch's results
+    and the job counters are written with one bulk update and commit, so
+    progress is visible while the job runs and a stopped job resumes where it
+    left off. If sends are shed because the provider is degraded, the job
+    goes back to pending after that batch and BroadcastDeferred is raised.
+    """
+    if not _claim(broadcast_id):
+        return False
+
+    broadcast = db.session.get(Broadcast, broadcast_id)
+    service = WhatsAppService(db.session.get(User, broadcast.user_id))
+    message = broadcast.message
+
+    last_id = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'broadcast-{broadcast_id}') as executor:
+            while True:
+                status = db.session.scalar(select(Broadcast.status).where(Broadcast.id == broadcast_id))
+                if status != 'running':
+                    return False
+                if stopping is not None and stopping.is_set():
+                    requeue_broadcast(broadcast_id)
+                    return False
+
+                last_id, deferred = _send_batch(executor, service, broadcast_id, message, last_id, batch_size)
+                if deferred:
+                    requeue_broadcast(broadcast_id)
+                    raise BroadcastDeferred(f'{deferred} sends of broadcast {broadcast_id} were deferred')
+                if last_id is None:
+                    break
+    except BroadcastDeferred:
+        raise
+    except Exception:
+        db.session.rollback()
+        requeue_broadcast(broadcast_id)
+        raise
+
+    db.session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id, Broadcast.status == 'running')
+        .values(status='completed', finished_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return True
+
+def _send_batch(executor, service, broadcast_id, message, last_id, batch_size):
+    """Send the next batch after ``last_id``. Returns the new last id (None
+    when done) and how many sends were shed and left pending."""
+    batch = db.session.execute(
+        select(BroadcastRecipient.id, BroadcastRecipient.phone_number)
+        .where(
+            BroadcastRecipient.broadcast_id == broadcast_id,
+            BroadcastRecipient.status == 'pending',
+            BroadcastRecipient.id > last_id
+        )
+        .order_by(BroadcastRecipient.id)
+        .limit(batch_size)
+    ).all()
+    if not batch:
+        return None, 0
+
+    app = current_app._get_current_object()
+    results = list(executor.map(lambda row: _send(app, service, message, row[0], row[1]), batch))
+    sent = sum(1 for result in results if result['status'] == 'sent')
+    failed = sum(1 for result in results if result['status'] == 'failed')
+
+    db.session.execute(update(BroadcastRecipient), results)
+    db.session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id)
+        .values(sent=Broadcast.sent + sent, failed=Broadcast.failed + failed)
+    )
+    db.session.commit()
+    return batch[-1][0], len(results) - sent - failed
+
+class BroadcastRunner:
+    """Runs broadcasts on background threads inside the web process."""
+
+    def __init__(self, workers=8, batch_size=500, retry_delay=30):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.app = None
+        self._threads = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('BROADCAST_WORKERS', self.workers)
+        self.batch_size = app.config.get('BROADCAST_BATCH_SIZE', self.batch_size)
+        self.retry_delay = app.config.get('BROADCAST_RETRY_DELAY', self.retry_delay)
+        atexit.register(self.shutdown)
+
+    def start(self, broadcast_id):
+        with self._lock:
+            thread = self._threads.get(broadcast_id)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run, args=(broadcast_id,), name=f'broadcast-{broadcast_id}', daemon=True)
+            self._threads[broadcast_id] = thread
+        thread.start()
+
+    def _run(self, broadcast_id):
+        try:
+            with self.app.app_context():
+                run_broadcast(broadcast_id, self.workers, self.batch_size, self._stopping)
+        except BroadcastDeferred as e:
+            print(f'Broadcast {broadcast_id} paused, retrying in {self.retry_delay:.0f}s: {str(e)}')
+            self._schedule(broadcast_id)
+        except Exception as e:
+            print(f'Error running broadcast {broadcast_id}: {str(e)}')
+        finally:
+            with self._lock:
+                self._threads.pop(broadcast_id, None)
+
+    def _schedule(self, broadcast_id):
+        if self._stopping.is_set():
+            return
+        timer = threading.Timer(self.retry_delay, self._retry, args=(broadcast_id,))
+        timer.daemon = True
+        with self._lock:
+            self._timers[broadcast_id] = timer
+        timer.start()
+
+    def _retry(self, broadcast_id):
+        with self._lock:
+            self._timers.pop(broadcast_id, None)
+        self.start(broadcast_id)
+
+    def shutdown(self, timeout=30):
+        """Stop after the current batch; unfinished broadcasts go back to pending."""
+        self._stopping.set()
+        with self._lock:
+            timers, self._timers = list(self._timers.values()), {}
+            threads = list(self._threads.values())
+        for timer in timers:
+            timer.cancel()
+        for thread in threads:
+            thread.join(timeout)
+
+broadcast_runner = BroadcastRunner()
@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+from sqlalchemy import delete, select
+from models import db, dialect_insert
+from models.processed_message import ProcessedMessage
+from utils.cache import TTLCache
+
+# Recently processed ids, so most redeliveries are dropped without a query.
+_seen = TTLCache(
+    maxsize=int(os.environ.get('DEDUP_CACHE_SIZE', 100000)),
+    ttl=int(os.environ.get('DEDUP_CACHE_TTL', 3600))
+)
+
+def claim_messages(provider, message_ids):
+    """Return the subset of ``message_ids`` not processed before.
+
+    New ids are inserted into processed_messages in the caller's transaction:
+    if the request fails and rolls back, a redelivery is processed again;
+    once it commits, a concurrent or later redelivery finds the key taken.
+    Call remember_messages() with the result after committing.
+    """
+    candidates = []
+    for message_id in dict.fromkeys(message_ids):
+        if message_id and (provider, message_id) not in _seen:
+            candidates.append(message_id)
+    if not candidates:
+        return set()
+
+    now = datetime.utcnow()
+    stmt = dialect_insert(ProcessedMessage).values([
+        {'provider': provider, 'message_id': message_id, 'received_at': now}
+        for message_id in candidates
+    ]).on_conflict_do_nothing(index_elements=[ProcessedMessage.provider, ProcessedMessage.message_id])
+
+    if db.engine.dialect.insert_returning:
+        return set(db.session.scalars(stmt.returning(ProcessedMessage.message_id)))
+
+    # Older SQLite without RETURNING: look the survivors up first
+    existing = set(db.session.scalars(
+        select(ProcessedMessage.message_id)
+        .where(ProcessedMessage.provider == provider, ProcessedMessage.message_id.in_(candidates))
+    ))
+    db.session.execute(stmt)
+    return set(candidates) - existing
+
+def remember_messages(provider, message_ids):
+    for message_id in message_ids:
+        _seen.set((provider, message_id), True)
+
+def purge_processed_messages(before, batch_size=5000):
+    """Delete dedup keys recorded before ``before``; returns the row count."""
+    purged = 0
+    while True:
+        keys = db.session.execute(
+            select(ProcessedMessage.provider, ProcessedMessage.message_id)
+            .where(ProcessedMessage.received_at < before)
+            .limit(batch_size)
+        ).all()
+        if not keys:
+            return purged
+
+        for provider in {provider for provider, _ in keys}:
+            db.session.execute(delete(ProcessedMessage).where(
+                ProcessedMessage.provider == provider,
+                ProcessedMessage.message_id.in_([message_id for key_provider, message_id in keys if key_provider == provider])
+            ))
+        db.session.commit()
+        purged += len(keys)
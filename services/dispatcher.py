@@ -0,0 +1,120 @@
+import atexit
+import queue
+import threading
+import time
+
+_STOP = object()
+
+class OutboundDispatcher:
+    """Bounded queue of outbound sends drained by a pool of worker threads.
+
+    Webhooks enqueue replies and return immediately; when the queue is full
+    the send runs inline so callers are slowed down instead of losing work.
+    """
+
+    def __init__(self, workers=4, queue_size=1000, enabled=True):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.enabled = enabled
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._sent = 0
+        self._failed = 0
+        self._inline = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('OUTBOUND_WORKERS', self.workers)
+        self.queue_size = app.config.get('OUTBOUND_QUEUE_SIZE', self.queue_size)
+        self.enabled = app.config.get('OUTBOUND_ASYNC', self.enabled)
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        # Threads are started on first use rather than in init_app, so a
+        # pre-forking server never forks a process with live workers.
+        with self._lock:
+            if self._threads:
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'outbound-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        if not self.enabled or self.workers <= 0:
+            self._run(func, args, kwargs)
+            return
+
+        if not self._threads:
+            self._start()
+
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._inline += 1
+            self._run(func, args, kwargs)
+
+    def send_message(self, whatsapp_service, to_number, message_body):
+        self.submit(whatsapp_service.send_message, to_number, message_body)
+
+    def _run(self, func, args, kwargs):
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    func(*args, **kwargs)
+            else:
+                func(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            print(f'Error sending outbound message: {str(e)}')
+        else:
+            with self._lock:
+                self._sent += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self._run(*job)
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'in_flight': self._in_flight,
+                'workers': len(self._threads),
+                'sent': self._sent,
+                'failed': self._failed,
+                'sent_inline': self._inline
+            }
+
+    def shutdown(self, timeout=30):
+        """Let queued sends finish, then stop the worker threads."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+
+        for _ in threads:
+            self._queue.put(_STOP)
+
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+dispatcher = OutboundDispatcher()
@@ -0,0 +1,139 @@
+import atexit
+import threading
+from collections import deque
+from datetime import datetime
+from sqlalchemy import insert
+from models import db
+from models.message_log import MessageLog
+from services.rollups import apply_rollups
+from services.senders import apply_senders
+
+def write_logs(rows):
+    """Bulk insert message log rows, their rollups and sender stats into the
+    current session's transaction."""
+    if rows:
+        db.session.execute(insert(MessageLog), rows)
+        apply_rollups(rows)
+        apply_senders(rows)
+
+class MessageLogWriter:
+    """Records MessageLog rows, either straight into the request's session or
+    buffered and group-committed from a background thread (write-behind).
+
+    In write-behind mode rows are flushed once ``batch_size`` are pending or
+    ``flush_interval`` seconds have passed. At most ``max_pending`` rows are
+    held in memory; if the database stalls the oldest rows are dropped.
+    """
+
+    def __init__(self, write_behind=False, batch_size=500, flush_interval=1.0, max_pending=50000):
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.app = None
+        self.dropped = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def init_app(self, app):
+        self.app = app
+        self.write_behind = app.config.get('MESSAGE_LOG_WRITE_BEHIND', self.write_behind)
+        self.batch_size = app.config.get('MESSAGE_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('MESSAGE_LOG_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get('MESSAGE_LOG_MAX_PENDING', self.max_pending)
+        atexit.register(self.shutdown)
+
+    def record(self, bot_id, sender, direction, message):
+        self.record_many([(bot_id, sender, direction, message)])
+
+    def record_many(self, entries):
+        """Record several (bot_id, sender, direction, message) entries at
+        once: one bulk insert and one set of rollup and sender upserts, or a
+        single append to the write-behind buffer."""
+        timestamp = datetime.utcnow()
+        rows = [
+            {'bot_id': bot_id, 'sender': sender, 'direction': direction, 'message': message, 'timestamp': timestamp}
+            for bot_id, sender, direction, message in entries
+        ]
+        if not rows:
+            return
+
+        if not self.write_behind:
+            # The caller commits together with the rest of its request.
+            write_logs(rows)
+            return
+
+        with self._lock:
+            self._pending.extend(rows)
+            self._trim()
+            pending = len(self._pending)
+
+        if self._thread is None:
+            self._start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _trim(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            for _ in range(overflow):
+                self._pending.popleft()
+            self.dropped += overflow
+            print(f'WARNING: message log buffer full, dropped {overflow} rows')
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='message-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f'Error flushing message logs: {str(e)}')
+
+    def flush(self):
+        """Write every pending row in one transaction. Returns the row count."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending)
+                self._pending.clear()
+            if not rows:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    write_logs(rows)
+                    db.session.commit()
+            except Exception:
+                with self._lock:
+                    self._pending.extendleft(reversed(rows))
+                    self._trim()
+                raise
+
+            return len(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            thread.join()
+        if self.pending():
+            self.flush()
+
+log_writer = MessageLogWriter()
@@ -0,0 +1,91 @@
+from services.rule_matcher import get_matcher
+from utils.cache import TTLCache
+
+# Longest body we send in one WhatsApp message per channel, kept a little
+# under the provider limits (Twilio 1600, Meta 4096 characters).
+MESSAGE_LIMITS = {
+    'twilio': 1500,
+    'meta': 4000
+}
+
+_menus = TTLCache(maxsize=1024, ttl=3600)
+
+def parse_menu_page(message, commands):
+    """Return the requested page if ``message`` asks for the menu, e.g.
+    "help" or "help 2", otherwise None."""
+    text = message.lower()
+    if text in commands:
+        return 1
+
+    words = text.split()
+    if len(words) == 2 and words[0] in commands and words[1].isdigit():
+        return max(int(words[1]), 1)
+    return None
+
+def get_menu_page(bot, channel, page=1):
+    pages = _get_pages(bot, channel)
+    return pages[min(page, len(pages)) - 1]
+
+def invalidate_menus(bot_id):
+    for channel in MESSAGE_LIMITS:
+        _menus.pop((bot_id, channel))
+
+def _get_pages(bot, channel):
+    key = (bot.id, channel)
+    cached = _menus.get(key)
+    if cached is not None and cached[0] == bot.version:
+        return cached[1]
+
+    pages = _render_pages(bot, channel)
+    _menus.set(key, (bot.version, pages))
+    return pages
+
+def _render_pages(bot, channel):
+    rules = get_matcher(bot).rules
+
+    if channel == 'twilio':
+        if not rules:
+            return [f"Welcome to {bot.name}! 🤖\n\nNo commands configured yet. Send any message to interact with the bot."]
+
+        header = f"Welcome to {bot.name}! 🤖\n\nAvailable commands:\n\n"
+        lines = [f"• {keyword}: {response[:50]}{'...' if len(response) > 50 else ''}\n" for keyword, response in rules]
+        footer = "\nType any keyword to get started, or send any message for general assistance."
+    else:
+        if not rules:
+            return ["No commands configured yet. Please add rules to your bot on the dashboard."]
+
+        header = f"Available commands for {bot.name}:\n\n"
+        lines = [f"• {keyword}: {response}\n" for keyword, response in rules]
+        footer = ""
+
+    return _paginate(header, lines, footer, MESSAGE_LIMITS[channel])
+
+def _paginate(header, lines, footer, limit):
+    if len(header) + sum(len(line) for line in lines) + len(footer) <= limit:
+        return [header + ''.join(lines) + footer]
+
+    # Leave room for the "Page x of y" navigation line on every page
+    budget = max(limit - len(header) - len(footer) - 60, 100)
+
+    chunks = []
+    current = []
+    size = 0
+    for line in lines:
+        if len(line) > budget:
+            line = line[:budget - 4] + '...\n'
+        if current and size + len(line) > budget:
+            chunks.append(current)
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line)
+    chunks.append(current)
+
+    total = len(chunks)
+    pages = []
+    for number, chunk in enumerate(chunks, 1):
+        navigation = f"\nPage {number} of {total}."
+        if number < total:
+            navigation += f" Send 'help {number + 1}' for more."
+        pages.append(header + ''.join(chunk) + navigation + "\n" + footer)
+    return pages
@@ -0,0 +1,237 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cache hit up to a slow provider call.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class Metrics:
+    """In-process counters, gauges and latency histograms.
+
+    With ``directory`` set, every process periodically writes its values to
+    ``<directory>/metrics-<pid>.json`` and the exposition merges all files,
+    so a scrape that lands on any gunicorn worker reports totals for all of
+    them. Counters and histograms of exited workers keep counting towards the
+    totals; gauges only come from live processes.
+    """
+
+    def __init__(self, directory=None, flush_interval=10.0, buckets=DEFAULT_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._collectors = []
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR', self.directory)
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        atexit.register(self.shutdown)
+
+    def _reset(self):
+        # A forked worker starts from zero instead of double counting
+        # whatever the parent recorded before the fork.
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._ensure_writer()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += seconds
+            histogram[2] += 1
+        self._ensure_writer()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, collector):
+        """Add a callable returning ``(kind, name, labels, value)`` tuples,
+        where kind is 'counter' or 'gauge'. It is called on every snapshot."""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [
+                [name, list(labels), list(histogram[0]), histogram[1], histogram[2]]
+                for (name, labels), histogram in self._histograms.items()
+            ]
+
+        gauges = []
+        for collector in self._collectors:
+            try:
+                for kind, name, labels, value in collector():
+                    target = counters if kind == 'counter' else gauges
+                    target.append([name, list(_label_key(labels)), value])
+            except Exception as e:
+                print(f'Error collecting metrics: {str(e)}')
+
+        return {
+            'pid': os.getpid(),
+            'buckets': list(self.buckets),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms
+        }
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def write_snapshot(self):
+        if not self.directory:
+            return
+        snapshot = self.snapshot()
+        path = self._snapshot_path(snapshot['pid'])
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temporary, path)
+
+    def _ensure_writer(self):
+        # Started lazily like the dispatcher, so no thread exists before fork.
+        if self._thread is not None or not self.directory:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f'Error writing metrics snapshot: {str(e)}')
+
+    def _load_snapshots(self):
+        self.write_snapshot()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Merge this process's values with every other worker's snapshot."""
+        snapshots = self._load_snapshots() if self.directory else [self.snapshot()]
+        own_pid = os.getpid()
+
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+
+            if snapshot['pid'] == own_pid or _pid_alive(snapshot['pid']):
+                for name, labels, value in snapshot['gauges']:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+
+            if tuple(snapshot['buckets']) != self.buckets:
+                continue
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+        return counters, gauges, histograms
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, gauges, histograms = self.collect()
+        lines = []
+
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            for name in sorted({name for name, _ in values}):
+                lines.append(f'# TYPE {name} {kind}')
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", _format_value(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def shutdown(self):
+        self._stopping.set()
+        if self.directory:
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f'Error writing metrics snapshot: {str(e)}')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+metrics = Metrics()
@@ -0,0 +1,293 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, dialect_insert
+from models.engine import database_url
+from models.rate_limit import RateLimitBucket
+from services.metrics import metrics
+
+# Sends per second; 0 disables a limit. Buckets hold BURST_SECONDS worth of
+# tokens, so short spikes pass straight through.
+PROVIDER_RATES = {
+    'meta': float(os.environ.get('RATE_LIMIT_META_PER_SECOND', 80)),
+    'twilio': float(os.environ.get('RATE_LIMIT_TWILIO_PER_SECOND', 80))
+}
+NUMBER_RATE = float(os.environ.get('RATE_LIMIT_PER_NUMBER_PER_SECOND', 20))
+BURST_SECONDS = float(os.environ.get('RATE_LIMIT_BURST_SECONDS', 1))
+MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 5))
+# On SQLite every reservation would queue for the single write lock, so the
+# buckets default to memory there (limits then apply per process).
+STORE = os.environ.get('RATE_LIMIT_STORE') or ('memory' if database_url().startswith('sqlite') else 'database')
+
+RETRY_ATTEMPTS = int(os.environ.get('SEND_RETRY_ATTEMPTS', 4))
+RETRY_BASE_DELAY = float(os.environ.get('SEND_RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.environ.get('SEND_RETRY_MAX_DELAY', 20))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+FAILURE_WINDOW = float(os.environ.get('SEND_FAILURE_WINDOW', 60))
+FAILURE_THRESHOLD = float(os.environ.get('SEND_FAILURE_THRESHOLD', 0.5))
+FAILURE_MIN_CALLS = int(os.environ.get('SEND_FAILURE_MIN_CALLS', 20))
+FAILURE_COOLDOWN = float(os.environ.get('SEND_FAILURE_COOLDOWN', 30))
+
+class RateLimitExceeded(Exception):
+    pass
+
+class CircuitOpenError(Exception):
+    pass
+
+class MemoryStore:
+    """Token buckets for a single process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key, rate, capacity, now, max_wait):
+        """Reserve one token. Returns the seconds to wait before using it, or
+        None (reserving nothing) if that would be longer than ``max_wait``.
+
+        Tokens may go negative: each caller queues behind earlier
+        reservations instead of polling, so waits are first come, first served.
+        """
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate) - 1
+            if tokens < -rate * max_wait:
+                return None
+            self._buckets[key] = (tokens, now)
+            return max(-tokens / rate, 0)
+
+class DatabaseStore:
+    """Token buckets in the rate_limit_buckets table, shared by all workers.
+
+    Refill and reservation happen in one conditional UPDATE, so two workers
+    can never spend the same token. Each call runs on its own connection and
+    commits straight away, independent of the caller's session.
+    """
+
+    def reserve(self, key, rate, capacity, now, max_wait):
+        refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * rate
+        available = case((refilled > capacity, capacity), else_=refilled)
+
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.key == key, available - 1 >= -rate * max_wait)
+                .values(tokens=available - 1, updated_at=now)
+            )
+            if result.rowcount == 1:
+                tokens = conn.execute(
+                    select(RateLimitBucket.tokens).where(RateLimitBucket.key == key)
+                ).scalar_one()
+                return max(-tokens / rate, 0)
+
+            exists = conn.execute(
+                select(RateLimitBucket.key).where(RateLimitBucket.key == key)
+            ).first()
+            if exists:
+                return None
+
+            inserted = conn.execute(
+                dialect_insert(RateLimitBucket)
+                .values(key=key, tokens=capacity - 1, updated_at=now)
+                .on_conflict_do_nothing(index_elements=[RateLimitBucket.key])
+            )
+        if inserted.rowcount == 1:
+            return 0
+        # Another worker created the bucket first; take from it instead
+        return self.reserve(key, rate, capacity, now, max_wait)
+
+class RateLimiter:
+    def __init__(self, store, max_wait=MAX_WAIT, burst_seconds=BURST_SECONDS):
+        self.store = store
+        self.max_wait = max_wait
+        self.burst_seconds = burst_seconds
+
+    def acquire(self, limits):
+        """Take a token from every (key, rate) bucket, waiting up to max_wait
+        in total; raises RateLimitExceeded if that is not enough."""
+        deadline = time.monotonic() + self.max_wait
+        for key, rate in limits:
+            if rate <= 0:
+                continue
+            capacity = max(rate * self.burst_seconds, 1)
+            remaining = max(deadline - time.monotonic(), 0)
+            try:
+                wait = self.store.reserve(key, rate, capacity, time.time(), remaining)
+            except SQLAlchemyError as e:
+                # Never stop sending because the limiter's table is unavailable
+                print(f'Error checking rate limit {key}: {str(e)}')
+                continue
+            if wait is None:
+                raise RateLimitExceeded(f'Rate limit {key} exceeded')
+            if wait > 0:
+                time.sleep(wait)
+
+class FailureBudget:
+    """Per-provider circuit breaker over a sliding window of recent sends.
+
+    Once at least ``min_calls`` sends in ``window`` seconds have been seen and
+    the share of retryable failures reaches ``threshold``, sends are shed for
+    ``cooldown`` seconds. After that one trial send is let through; its result
+    closes the circuit or opens it again.
+    """
+
+    def __init__(self, window=FAILURE_WINDOW, threshold=FAILURE_THRESHOLD,
+                 min_calls=FAILURE_MIN_CALLS, cooldown=FAILURE_COOLDOWN):
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._outcomes = {}
+        self._open_until = {}
+        self._trial = set()
+
+    def allow(self, provider):
+        with self._lock:
+            open_until = self._open_until.get(provider)
+            if open_until is None:
+                return True
+            if time.monotonic() < open_until or provider in self._trial:
+                return False
+            self._trial.add(provider)
+            return True
+
+    def record(self, provider, ok):
+        now = time.monotonic()
+        with self._lock:
+            if provider in self._trial:
+                self._trial.discard(provider)
+                if ok:
+                    self._open_until.pop(provider, None)
+                    self._outcomes.pop(provider, None)
+                else:
+                    self._open_until[provider] = now + self.cooldown
+                return
+
+            outcomes = self._outcomes.setdefault(provider, deque())
+            outcomes.append((now, ok))
+            while outcomes and outcomes[0][0] < now - self.window:
+                outcomes.popleft()
+
+            failures = sum(1 for _, success in outcomes if not success)
+            if len(outcomes) >= self.min_calls and failures / len(outcomes) >= self.threshold:
+                self._open_until[provider] = now + self.cooldown
+                outcomes.clear()
+                print(f'WARNING: {provider} send failure rate too high, shedding sends for {self.cooldown:.0f}s')
+
+    def release(self, provider):
+        """Give back a trial that ended without reaching the provider."""
+        with self._lock:
+            self._trial.discard(provider)
+
+    def is_open(self, provider):
+        with self._lock:
+            return provider in self._open_until
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0)
+
+def classify_error(error):
+    """Return (retryable, retry_after) for an exception raised by a send.
+
+    Read timeouts are not retried: the provider may already have accepted the
+    message, and a retry would deliver it twice.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        response = error.response
+        return response.status_code in RETRYABLE_STATUSES, retry_after_seconds(response.headers.get('Retry-After'))
+    if isinstance(error, requests.ConnectionError):
+        return True, None
+
+    # TwilioRestException carries the HTTP status without the response headers
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUSES, None
+    return False, None
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than Retry-After.
+
+    Returns None when the provider asks us to wait longer than RETRY_MAX_DELAY,
+    so the thread is freed instead of sleeping.
+    """
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        if retry_after > RETRY_MAX_DELAY:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+rate_limiter = RateLimiter(MemoryStore() if STORE == 'memory' else DatabaseStore())
+failure_budget = FailureBudget()
+
+def _circuit_metrics():
+    return [
+        ('gauge', 'whatsapp_send_circuit_open', {'provider': provider}, int(failure_budget.is_open(provider)))
+        for provider in PROVIDER_RATES
+    ]
+
+metrics.register_collector(_circuit_metrics)
+
+def deliver(provider, number, send):
+    """Call ``send()`` under the provider's rate limits, retry policy and
+    failure budget."""
+    if not failure_budget.allow(provider):
+        metrics.inc('whatsapp_send_shed_total', provider=provider, reason='circuit_open')
+        raise CircuitOpenError(f'{provider} sends are paused after repeated failures')
+
+    limits = [(f'provider:{provider}', PROVIDER_RATES.get(provider, 0))]
+    if number:
+        limits.append((f'number:{provider}:{number}', NUMBER_RATE))
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            rate_limiter.acquire(limits)
+        except RateLimitExceeded:
+            failure_budget.release(provider)
+            metrics.inc('whatsapp_send_shed_total', provider=provider, reason='rate_limited')
+            raise
+
+        try:
+            result = send()
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            if not retryable:
+                # A rejected message (bad number, bad content) says nothing
+                # about the provider's health.
+                failure_budget.record(provider, True)
+                raise
+            failure_budget.record(provider, False)
+
+            delay = backoff_delay(attempt, retry_after)
+            if attempt >= RETRY_ATTEMPTS or delay is None or not failure_budget.allow(provider):
+                raise
+            metrics.inc('whatsapp_send_retries_total', provider=provider)
+            time.sleep(delay)
+            continue
+
+        failure_budget.record(provider, True)
+        return result
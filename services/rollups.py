@@ -0,0 +1,98 @@
+from collections import defaultdict
+from sqlalchemy import case, delete, func, insert, select
+from models import db, dialect_insert
+from models.message_log import MessageLog
+from models.message_rollup import MessageRollup, RollupSender
+from models.bot_sender import BotSender
+
+def apply_rollups(rows):
+    """Fold newly logged message rows into the per-bot, per-day counters.
+
+    Runs inside the caller's transaction, so counters commit together with
+    the log rows they describe.
+    """
+    counters = defaultdict(lambda: {'incoming': 0, 'outgoing': 0, 'senders': set()})
+    for row in rows:
+        counter = counters[(row['bot_id'], row['timestamp'].date())]
+        if row['direction'] in ('incoming', 'outgoing'):
+            counter[row['direction']] += 1
+        counter['senders'].add(row['sender'])
+
+    values = []
+    for (bot_id, day), counter in counters.items():
+        # Count only the senders this insert actually added: a sender first
+        # seen by two concurrent transactions is inserted (and counted) once.
+        stmt = dialect_insert(RollupSender).values([
+            {'bot_id': bot_id, 'day': day, 'sender': sender} for sender in counter['senders']
+        ]).on_conflict_do_nothing()
+        if db.engine.dialect.insert_returning:
+            new_senders = len(db.session.scalars(stmt.returning(RollupSender.sender)).all())
+        else:
+            new_senders = db.session.execute(stmt).rowcount
+
+        values.append({
+            'bot_id': bot_id,
+            'day': day,
+            'incoming': counter['incoming'],
+            'outgoing': counter['outgoing'],
+            'unique_senders': new_senders
+        })
+
+    if not values:
+        return
+
+    stmt = dialect_insert(MessageRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MessageRollup.bot_id, MessageRollup.day],
+        set_={
+            'incoming': MessageRollup.incoming + stmt.excluded.incoming,
+            'outgoing': MessageRollup.outgoing + stmt.excluded.outgoing,
+            'unique_senders': MessageRollup.unique_senders + stmt.excluded.unique_senders
+        }
+    )
+    db.session.execute(stmt)
+
+def rebuild_rollups(bot_id=None):
+    """Recompute rollups and sender stats from message_logs, for one bot or
+    for all of them."""
+    log_day = func.date(MessageLog.timestamp)
+    senders = select(MessageLog.bot_id, log_day, MessageLog.sender).distinct()
+    counts = select(
+        MessageLog.bot_id,
+        log_day,
+        func.sum(case((MessageLog.direction == 'incoming', 1), else_=0)),
+        func.sum(case((MessageLog.direction == 'outgoing', 1), else_=0)),
+        func.count(func.distinct(MessageLog.sender))
+    ).group_by(MessageLog.bot_id, log_day)
+
+    bot_senders = select(
+        MessageLog.bot_id,
+        MessageLog.sender,
+        func.min(MessageLog.timestamp),
+        func.max(MessageLog.timestamp),
+        func.sum(case((MessageLog.direction == 'incoming', 1), else_=0))
+    ).group_by(MessageLog.bot_id, MessageLog.sender)
+
+    rollups = delete(MessageRollup)
+    rollup_senders = delete(RollupSender)
+    known_senders = delete(BotSender)
+    if bot_id is not None:
+        senders = senders.where(MessageLog.bot_id == bot_id)
+        counts = counts.where(MessageLog.bot_id == bot_id)
+        bot_senders = bot_senders.where(MessageLog.bot_id == bot_id)
+        rollups = rollups.where(MessageRollup.bot_id == bot_id)
+        rollup_senders = rollup_senders.where(RollupSender.bot_id == bot_id)
+        known_senders = known_senders.where(BotSender.bot_id == bot_id)
+
+    db.session.execute(rollups)
+    db.session.execute(rollup_senders)
+    db.session.execute(known_senders)
+    db.session.execute(insert(RollupSender).from_select(['bot_id', 'day', 'sender'], senders))
+    db.session.execute(insert(BotSender).from_select(
+        ['bot_id', 'sender', 'first_seen', 'last_seen', 'message_count'], bot_senders
+    ))
+    result = db.session.execute(insert(MessageRollup).from_select(
+        ['bot_id', 'day', 'incoming', 'outgoing', 'unique_senders'], counts
+    ))
+    db.session.commit()
+    return result.rowcount
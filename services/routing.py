@@ -0,0 +1,119 @@
+import os
+from collections import namedtuple
+from models.bot import Bot
+from models.user import User, normalize_phone_number
+from utils.cache import TTLCache
+
+# Plain snapshots rather than ORM instances, so cached routes can be shared
+# between requests and threads without being tied to a session.
+ActiveBot = namedtuple('ActiveBot', ['id', 'user_id', 'name', 'fallback_message', 'version'])
+Route = namedtuple('Route', ['user_id', 'phone_number', 'bot'])
+TwilioRoute = namedtuple('TwilioRoute', ['user_id', 'phone_number', 'bot', 'auth_token'])
+
+DEFAULT_ROUTE_KEY = ('default',)
+
+_routes = TTLCache(
+    maxsize=int(os.environ.get('ROUTING_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('ROUTING_CACHE_TTL', 30))
+)
+
+def _snapshot_bot(bot):
+    if not bot:
+        return None
+    return ActiveBot(bot.id, bot.user_id, bot.name, bot.fallback_message, bot.version)
+
+def resolve_sender(phone_number):
+    """Route a sender number to its registered user and that user's active bot."""
+    return resolve_senders([phone_number])[phone_number]
+
+def resolve_senders(phone_numbers):
+    """Route many sender numbers at once, with one query per table for misses."""
+    routes = {}
+    missing = []
+    for phone_number in phone_numbers:
+        route = _routes.get(('sender', phone_number))
+        if route is not None:
+            routes[phone_number] = route
+        else:
+            missing.append(phone_number)
+
+    if not missing:
+        return routes
+
+    users = {}
+    for user in User.query.filter(User.phone_number.in_(missing)).order_by(User.id):
+        users.setdefault(user.phone_number, user)
+
+    bots = {}
+    if users:
+        user_ids = [user.id for user in users.values()]
+        active_bots = Bot.query.filter(Bot.user_id.in_(user_ids), Bot.active == True).order_by(Bot.id)
+        for bot in active_bots:
+            bots.setdefault(bot.user_id, bot)
+
+    for phone_number in missing:
+        user = users.get(phone_number)
+        if not user:
+            route = Route(None, phone_number, None)
+        else:
+            route = Route(user.id, user.phone_number, _snapshot_bot(bots.get(user.id)))
+        _routes.set(('sender', phone_number), route)
+        routes[phone_number] = route
+
+    return routes
+
+def resolve_default_bot():
+    """Route to the first active bot, as used by the single-tenant Twilio webhook."""
+    route = _routes.get(DEFAULT_ROUTE_KEY)
+    if route is not None:
+        return route
+
+    bot = Bot.query.filter_by(active=True).first()
+    if not bot:
+        route = Route(None, None, None)
+    else:
+        owner = User.query.get(bot.user_id)
+        route = Route(bot.user_id, owner.phone_number if owner else None, _snapshot_bot(bot))
+
+    _routes.set(DEFAULT_ROUTE_KEY, route)
+    return route
+
+def resolve_twilio_number(to_number):
+    """Route a Twilio destination number to the user who owns it, that user's
+    active bot and their decrypted auth token (for signature checks)."""
+    number = normalize_phone_number(to_number)
+    if not number:
+        return TwilioRoute(None, None, None, None)
+
+    key = ('twilio', number)
+    route = _routes.get(key)
+    if route is not None:
+        return route
+
+    # Unique per account (ux_users_twilio_number_normalized)
+    user = User.query.filter_by(twilio_number_normalized=number).one_or_none()
+    if not user:
+        route = TwilioRoute(None, None, None, None)
+    else:
+        bot = Bot.query.filter_by(user_id=user.id, active=True).order_by(Bot.id).first()
+        auth_token = user.get_twilio_credentials()['auth_token']
+        route = TwilioRoute(user.id, user.phone_number, _snapshot_bot(bot), auth_token)
+
+    _routes.set(key, route)
+    return route
+
+def invalidate_twilio_number(number):
+    number = normalize_phone_number(number)
+    if number:
+        _routes.pop(('twilio', number))
+
+def invalidate_user_routes(user_id):
+    _routes.pop(DEFAULT_ROUTE_KEY)
+    _routes.pop_where(lambda key, route: route.user_id == user_id)
+
+def invalidate_phone_number(phone_number):
+    if phone_number:
+        _routes.pop(('sender', phone_number))
+
+def clear_routes():
+    _routes.clear()
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+from sqlalchemy import delete, insert, update
+from models import db
+from models.rule import Rule
+
+MAX_KEYWORD_LENGTH = 200
+
+class RuleImportError(ValueError):
+    pass
+
+def parse_rules(text, file_format):
+    """Parse a CSV (keyword,response header) or JSON rule set into a list of
+    (keyword, response) pairs. The first occurrence of a keyword wins, as it
+    would when matching."""
+    if file_format == 'json':
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise RuleImportError(f'Invalid JSON: {e}')
+        if isinstance(data, dict):
+            data = data.get('rules', [])
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise RuleImportError('JSON must be a list of {"keyword": ..., "response": ...} objects')
+        items = data
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not {'keyword', 'response'} <= set(reader.fieldnames):
+            raise RuleImportError('CSV must have a header row with keyword and response columns')
+        items = list(reader)
+
+    rules = []
+    seen = set()
+    for number, item in enumerate(items, 1):
+        keyword = str(item.get('keyword') or '').strip()
+        response = str(item.get('response') or '').strip()
+        if not keyword or not response:
+            raise RuleImportError(f'Rule {number} needs both a keyword and a response')
+        if len(keyword) > MAX_KEYWORD_LENGTH:
+            raise RuleImportError(f'Rule {number} keyword is longer than {MAX_KEYWORD_LENGTH} characters')
+        if keyword.lower() in seen:
+            continue
+        seen.add(keyword.lower())
+        rules.append((keyword, response))
+    return rules
+
+def plan_import(bot_id, rules, replace=False):
+    """Diff an imported rule set against the bot's rules.
+
+    Keywords are compared case-insensitively, like matching. With
+    ``replace`` every existing rule missing from the import is deleted, and
+    if the file orders rules differently from the bot, ``reorder`` is set:
+    the rules are then rewritten in file order, which sets their matching
+    priority (first rule wins).
+    """
+    existing = {}
+    duplicates = []
+    for rule in Rule.query.filter_by(bot_id=bot_id).order_by(Rule.id):
+        if rule.keyword.lower() in existing:
+            duplicates.append(rule)
+        else:
+            existing[rule.keyword.lower()] = rule
+
+    plan = {'add': [], 'update': [], 'delete': [], 'unchanged': 0, 'reorder': False}
+    imported = set()
+    for keyword, response in rules:
+        imported.add(keyword.lower())
+        rule = existing.get(keyword.lower())
+        if rule is None:
+            plan['add'].append({'keyword': keyword, 'response': response})
+        elif rule.keyword != keyword or rule.response != response:
+            plan['update'].append({'id': rule.id, 'keyword': keyword, 'response': response, 'old_response': rule.response})
+        else:
+            plan['unchanged'] += 1
+
+    if replace:
+        stale = [rule for key, rule in existing.items() if key not in imported]
+        for rule in sorted(stale + duplicates, key=lambda rule: rule.id):
+            plan['delete'].append({'id': rule.id, 'keyword': rule.keyword, 'response': rule.response})
+
+        # Kept rules stay in id order and additions go after them
+        kept = [key for key in existing if key in imported]
+        resulting = kept + [item['keyword'].lower() for item in plan['add']]
+        if resulting != [keyword.lower() for keyword, _ in rules]:
+            plan['reorder'] = True
+            plan['rules'] = [{'keyword': keyword, 'response': response} for keyword, response in rules]
+
+    return plan
+
+def apply_import(bot_id, plan):
+    """Execute a plan with bulk statements in the current transaction."""
+    if plan['reorder']:
+        db.session.execute(delete(Rule).where(Rule.bot_id == bot_id))
+        db.session.execute(insert(Rule), [
+            {'bot_id': bot_id, 'keyword': item['keyword'], 'response': item['response']}
+            for item in plan['rules']
+        ])
+        return
+
+    if plan['add']:
+        db.session.execute(insert(Rule), [
+            {'bot_id': bot_id, 'keyword': item['keyword'], 'response': item['response']}
+            for item in plan['add']
+        ])
+    if plan['update']:
+        db.session.execute(update(Rule), [
+            {'id': item['id'], 'keyword': item['keyword'], 'response': item['response']}
+            for item in plan['update']
+        ])
+    if plan['delete']:
+        db.session.execute(delete(Rule).where(
+            Rule.bot_id == bot_id,
+            Rule.id.in_([item['id'] for item in plan['delete']])
+        ))
@@ -0,0 +1,107 @@
+import os
+from models.rule import Rule
+from utils.cache import TTLCache
+
+_NO_MATCH = float('inf')
+
+class RuleMatcher:
+    """Aho-Corasick automaton over a bot's rule keywords.
+
+    Rules keep their database order, so the lowest index among the keywords
+    found in a message is the rule the old linear scan would have picked.
+    """
+
+    def __init__(self, rules):
+        self.rules = [(rule.keyword, rule.response) for rule in rules]
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [_NO_MATCH]
+
+        for index, (keyword, _) in enumerate(self.rules):
+            self._insert(keyword.lower(), index)
+
+        self._build_failure_links()
+
+    def _insert(self, keyword, index):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(_NO_MATCH)
+                self._goto[node][char] = next_node
+            node = next_node
+
+        if index < self._best[node]:
+            self._best[node] = index
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+
+        for node in queue:
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Each state also reports the best rule of every suffix state,
+                # so matching only needs one comparison per character.
+                self._best[child] = min(self._best[child], self._best[self._fail[child]])
+                queue.append(child)
+
+    def match(self, message):
+        """Return the response of the first rule whose keyword is in ``message``."""
+        goto = self._goto
+        fail = self._fail
+        best_by_node = self._best
+
+        best = best_by_node[0]
+        node = 0
+        for char in message.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            if best_by_node[node] < best:
+                best = best_by_node[node]
+                if best == 0:
+                    break
+
+        if best == _NO_MATCH:
+            return None
+        return self.rules[best][1]
+
+    def __len__(self):
+        return len(self.rules)
+
+_matchers = TTLCache(
+    maxsize=int(os.environ.get('RULE_MATCHER_CACHE_SIZE', 512)),
+    ttl=int(os.environ.get('RULE_MATCHER_TTL', 300))
+)
+
+def get_matcher(bot):
+    """Return the compiled matcher for ``bot``, rebuilding it if the bot's
+    version has moved on since it was cached."""
+    cached = _matchers.get(bot.id)
+    if cached is not None and cached[0] == bot.version:
+        return cached[1]
+
+    rules = Rule.query.filter_by(bot_id=bot.id).order_by(Rule.id).all()
+    matcher = RuleMatcher(rules)
+    _matchers.set(bot.id, (bot.version, matcher))
+    return matcher
+
+def invalidate_matcher(bot_id):
+    _matchers.pop(bot_id)
+
+def find_response(bot, message):
+    """The response of the first matching rule, or None."""
+    return get_matcher(bot).match(message)
+
+def match_response(bot, message):
+    response = find_response(bot, message)
+    return response if response is not None else bot.fallback_message
@@ -0,0 +1,62 @@
+import os
+from collections import defaultdict
+from models import db, dialect_insert
+from models.bot_sender import BotSender
+from utils.cache import TTLCache
+
+_known_senders = TTLCache(
+    maxsize=int(os.environ.get('KNOWN_SENDERS_CACHE_SIZE', 100000)),
+    ttl=int(os.environ.get('KNOWN_SENDERS_TTL', 3600))
+)
+
+def apply_senders(rows):
+    """Upsert first_seen/last_seen/message_count for each sender in ``rows``.
+
+    message_count counts incoming messages; outgoing rows only move last_seen.
+    """
+    senders = defaultdict(lambda: {'first_seen': None, 'last_seen': None, 'message_count': 0})
+    for row in rows:
+        sender = senders[(row['bot_id'], row['sender'])]
+        timestamp = row['timestamp']
+        if sender['first_seen'] is None or timestamp < sender['first_seen']:
+            sender['first_seen'] = timestamp
+        if sender['last_seen'] is None or timestamp > sender['last_seen']:
+            sender['last_seen'] = timestamp
+        if row['direction'] == 'incoming':
+            sender['message_count'] += 1
+
+    if not senders:
+        return
+
+    stmt = dialect_insert(BotSender).values([
+        dict(bot_id=bot_id, sender=sender, **values)
+        for (bot_id, sender), values in senders.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BotSender.bot_id, BotSender.sender],
+        set_={
+            'last_seen': stmt.excluded.last_seen,
+            'message_count': BotSender.message_count + stmt.excluded.message_count
+        }
+    )
+    db.session.execute(stmt)
+
+def is_new_conversation(bot_id, sender):
+    """True the first time ``sender`` is seen by ``bot_id``.
+
+    Call before logging the message. The sender is remembered in-process
+    straight away, so later messages are known even while their log rows are
+    still buffered by the write-behind writer.
+    """
+    key = (bot_id, sender)
+    if key in _known_senders:
+        return False
+
+    known = db.session.query(
+        BotSender.query.filter_by(bot_id=bot_id, sender=sender).exists()
+    ).scalar()
+    _known_senders.set(key, True)
+    return not known
+
+def forget_bot_senders(bot_id):
+    _known_senders.pop_where(lambda key, value: key[0] == bot_id)
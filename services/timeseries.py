@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from models import db
+from models.message_log import MessageLog
+from models.message_rollup import MessageRollup
+from utils.cache import TTLCache
+
+BUCKET_SIZES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+# A bucket is only cached once it ended this long ago, so rows still sitting
+# in the write-behind log buffer are not missed.
+CLOSED_GRACE = timedelta(minutes=1)
+
+_closed_buckets = TTLCache(maxsize=50000, ttl=24 * 3600)
+
+def floor_bucket(moment, bucket):
+    if bucket == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _empty(start):
+    return {'start': start.isoformat(), 'incoming': 0, 'outgoing': 0, 'active_senders': 0}
+
+def _hourly_rows(bot_id, start, end):
+    if db.engine.dialect.name == 'postgresql':
+        bucket_start = func.date_trunc('hour', MessageLog.timestamp)
+    else:
+        bucket_start = func.strftime('%Y-%m-%d %H:00:00', MessageLog.timestamp)
+
+    rows = db.session.query(
+        bucket_start,
+        func.sum(case((MessageLog.direction == 'incoming', 1), else_=0)),
+        func.sum(case((MessageLog.direction == 'outgoing', 1), else_=0)),
+        func.count(func.distinct(MessageLog.sender))
+    ).filter(
+        MessageLog.bot_id == bot_id,
+        MessageLog.timestamp >= start,
+        MessageLog.timestamp < end
+    ).group_by(bucket_start).all()
+
+    for moment, incoming, outgoing, senders in rows:
+        if isinstance(moment, str):
+            moment = datetime.strptime(moment, '%Y-%m-%d %H:%M:%S')
+        yield moment, incoming, outgoing, senders
+
+def _daily_rows(bot_id, start, end):
+    # Days come straight from the rollups, which also outlive archived logs.
+    rows = db.session.query(
+        MessageRollup.day, MessageRollup.incoming, MessageRollup.outgoing, MessageRollup.unique_senders
+    ).filter(
+        MessageRollup.bot_id == bot_id,
+        MessageRollup.day >= start.date(),
+        MessageRollup.day < end.date()
+    ).all()
+
+    for day, incoming, outgoing, senders in rows:
+        yield datetime(day.year, day.month, day.day), incoming, outgoing, senders
+
+def bot_timeseries(bot_id, bucket, start, end, now=None):
+    """Message volume per bucket in [start, end) for one bot.
+
+    Closed buckets are cached, so a refresh only queries from the oldest
+    bucket that is not cached yet (normally just the current one).
+    """
+    now = now or datetime.utcnow()
+    size = BUCKET_SIZES[bucket]
+    start = floor_bucket(start, bucket)
+
+    buckets = []
+    moment = start
+    while moment < end:
+        buckets.append(moment)
+        moment += size
+
+    results = {}
+    query_from = None
+    for moment in buckets:
+        cached = _closed_buckets.get((bot_id, bucket, moment))
+        if cached is None:
+            query_from = moment
+            break
+        results[moment] = cached
+
+    if query_from is not None:
+        query_to = buckets[-1] + size
+        fresh = {moment: _empty(moment) for moment in buckets if moment >= query_from}
+        rows = _hourly_rows if bucket == 'hour' else _daily_rows
+        for moment, incoming, outgoing, senders in rows(bot_id, query_from, query_to):
+            if moment in fresh:
+                fresh[moment].update(incoming=incoming, outgoing=outgoing, active_senders=senders)
+
+        for moment, values in fresh.items():
+            if moment + size + CLOSED_GRACE <= now:
+                _closed_buckets.set((bot_id, bucket, moment), values)
+        results.update(fresh)
+
+    return [results[moment] for moment in buckets]
+
+def forget_bot_timeseries(bot_id):
+    _closed_buckets.pop_where(lambda key, value: key[0] == bot_id)
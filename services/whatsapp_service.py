@@ -1,6 +1,98 @@
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 import requests
-from twilio.rest import Client
+from requests.adapters import HTTPAdapter
+from services.metrics import metrics
+from services.rate_limit import deliver
+
+CONNECT_TIMEOUT = float(os.environ.get('WHATSAPP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('WHATSAPP_READ_TIMEOUT', 10))
+POOL_SIZE = int(os.environ.get('WHATSAPP_POOL_SIZE', 10))
+META_POOL_SIZE = int(os.environ.get('WHATSAPP_META_POOL_SIZE', 50))
+META_GRAPH_URL = os.environ.get('META_GRAPH_URL', 'https://graph.facebook.com').rstrip('/')
+CLIENT_CACHE_SIZE = int(os.environ.get('WHATSAPP_CLIENT_CACHE_SIZE', 256))
+
+# Long-lived Twilio clients keyed by (provider, owner), least recently used
+# first. Each entry remembers a fingerprint of the credentials it was built
+# with; a different fingerprint means the credentials changed, so the old
+# client is closed and replaced. Past CLIENT_CACHE_SIZE owners the least
+# recently used client is closed, so idle sockets don't grow with tenants.
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+# Every Meta tenant talks to the same Graph host and sends its own access
+# token with each request, so they all share one connection pool.
+_shared_meta_session = None
+
+def _fingerprint(*values):
+    return hashlib.sha256('\0'.join(value or '' for value in values).encode()).hexdigest()
+
+def _pooled_session(pool_size=POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def _close_client(client):
+    session = client if isinstance(client, requests.Session) else getattr(client.http_client, 'session', None)
+    if session is not None:
+        session.close()
+
+def _get_client(provider, owner, fingerprint, factory):
+    key = (provider, owner)
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry and entry[0] == fingerprint:
+            _clients.move_to_end(key)
+            return entry[1]
+
+        client = factory()
+        _clients[key] = (fingerprint, client)
+        _clients.move_to_end(key)
+        stale = [entry] if entry else []
+        while len(_clients) > CLIENT_CACHE_SIZE:
+            stale.append(_clients.popitem(last=False)[1])
+
+    for _, old_client in stale:
+        _close_client(old_client)
+    return client
+
+def _meta_session():
+    global _shared_meta_session
+    with _clients_lock:
+        if _shared_meta_session is None:
+            _shared_meta_session = _pooled_session(META_POOL_SIZE)
+        return _shared_meta_session
+
+def _twilio_client(owner, account_sid, auth_token):
+    def factory():
+        # The Twilio SDK is slow to import; Meta-only deployments never load it
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        http_client = TwilioHttpClient(timeout=READ_TIMEOUT)
+        http_client.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        return Client(account_sid, auth_token, http_client=http_client)
+
+    return _get_client('twilio', owner, _fingerprint(account_sid, auth_token), factory)
+
+def evict_clients(owner=None):
+    """Close pooled Twilio clients for one owner (a user id, or 'env'), or
+    every client including the shared Meta session."""
+    global _shared_meta_session
+    with _clients_lock:
+        keys = [key for key in _clients if owner is None or key[1] == owner]
+        entries = [_clients.pop(key) for key in keys]
+        if owner is None and _shared_meta_session is not None:
+            entries.append((None, _shared_meta_session))
+            _shared_meta_session = None
+
+    for _, client in entries:
+        _close_client(client)
 
 class WhatsAppService:
     def __init__(self, user=None):
@@ -14,7 +106,7 @@ class WhatsAppService:
                 self.from_number = twilio_creds.get('whatsapp_number') or 'whatsapp:+14155238886'
 
                 if self.account_sid and self.auth_token:
-                    self.client = Client(self.account_sid, self.auth_token)
+                    self.client = _twilio_client(user.id, self.account_sid, self.auth_token)
                 else:
                     self.client = None
 
@@ -23,6 +115,7 @@ class WhatsAppService:
                 self.access_token = meta_creds.get('access_token')
                 self.phone_number_id = meta_creds.get('phone_number_id')
                 self.api_version = meta_creds.get('api_version') or 'v21.0'
+                self.session = _meta_session()
         else:
             self.provider = os.environ.get('WHATSAPP_PROVIDER', 'twilio')
 
@@ -32,7 +125,7 @@ class WhatsAppService:
                 self.from_number = os.environ.get('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886')
 
                 if self.account_sid and self.auth_token:
-                    self.client = Client(self.account_sid, self.auth_token)
+                    self.client = _twilio_client('env', self.account_sid, self.auth_token)
                 else:
                     self.client = None
 
@@ -40,6 +133,7 @@ class WhatsAppService:
                 self.access_token = os.environ.get('META_WHATSAPP_TOKEN')
                 self.phone_number_id = os.environ.get('META_PHONE_NUMBER_ID')
                 self.api_version = os.environ.get('META_API_VERSION', 'v21.0')
+                self.session = _meta_session()
 
     def send_message_twilio(self, to_number, message_body):
         if not self.client:
@@ -62,7 +156,7 @@ class WhatsAppService:
 
         to_number = to_number.replace('whatsapp:', '').replace('+', '').replace('-', '')
 
-        url = f"https://graph.facebook.com/{self.api_version}/{self.phone_number_id}/messages"
+        url = f"{META_GRAPH_URL}/{self.api_version}/{self.phone_number_id}/messages"
 
         headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -78,18 +172,27 @@ class WhatsAppService:
             }
         }
 
-        response = requests.post(url, headers=headers, json=data)
+        response = self.session.post(url, headers=headers, json=data, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
         response.raise_for_status()
 
         return response.json().get('messages', [{}])[0].get('id')
 
     def send_message(self, to_number, message_body):
-        if self.provider == 'twilio':
-            return self.send_message_twilio(to_number, message_body)
-        elif self.provider == 'meta':
-            return self.send_message_meta(to_number, message_body)
-        else:
-            raise ValueError(f'Unknown provider: {self.provider}')
+        started = time.perf_counter()
+        try:
+            if self.provider == 'twilio':
+                return deliver('twilio', self.from_number,
+                               lambda: self.send_message_twilio(to_number, message_body))
+            elif self.provider == 'meta':
+                return deliver('meta', self.phone_number_id,
+                               lambda: self.send_message_meta(to_number, message_body))
+            else:
+                raise ValueError(f'Unknown provider: {self.provider}')
+        except Exception:
+            metrics.inc('whatsapp_send_failures_total', provider=self.provider)
+            raise
+        finally:
+            metrics.observe('whatsapp_send_seconds', time.perf_counter() - started, provider=self.provider)
 
     def is_configured(self):
         if self.provider == 'twilio':
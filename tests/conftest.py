@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('ENCRYPTION_SECRET', 'test-encryption-secret')
+os.environ.setdefault('SESSION_SECRET', 'test-session-secret')
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('DB_AUTO_INIT', '1')
+    monkeypatch.setenv('OUTBOUND_ASYNC', '0')
+    monkeypatch.setenv('MESSAGE_LOG_ARCHIVE_DIR', str(tmp_path / 'archive'))
+
+    from app import create_app
+    from models import db
+    from models import user
+    from services import dedup, menus, rate_limit, routing, rule_matcher, senders, timeseries, whatsapp_service
+
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+
+    # Module-level state outlives the app, and ids are reused by the next
+    # test's database; don't leak it between tests
+    for cache in (routing._routes, rule_matcher._matchers, senders._known_senders, dedup._seen,
+                  menus._menus, timeseries._closed_buckets, user._credentials_cache):
+        cache.clear()
+    whatsapp_service.evict_clients()
+    if isinstance(rate_limit.rate_limiter.store, rate_limit.MemoryStore):
+        rate_limit.rate_limiter.store = rate_limit.MemoryStore()
+    rate_limit.failure_budget = rate_limit.FailureBudget()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from models import db
+from models.bot import Bot
+from models.user import User
+from services.log_writer import write_logs
+
+@pytest.fixture
+def bot_id(app, client):
+    with app.app_context():
+        user = User(username='owner', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        bot = Bot(user_id=user.id, name='Support', fallback_message='Sorry')
+        db.session.add(bot)
+        db.session.flush()
+        write_logs([
+            {'bot_id': bot.id, 'sender': 'a', 'direction': 'incoming', 'message': 'hi',
+             'timestamp': datetime(2024, 1, 1, 10, 30)},
+            {'bot_id': bot.id, 'sender': 'a', 'direction': 'outgoing', 'message': 'hello',
+             'timestamp': datetime(2024, 1, 1, 10, 30)}
+        ])
+        db.session.commit()
+        user_id, bot_id = user.id, bot.id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return bot_id
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z'),
+    ('2024-01-01T00:00:00+00:00', '2024-01-02T00:00:00'),
+    ('2024-01-01T02:00:00+02:00', '2024-01-02T02:00:00+02:00'),
+])
+def test_timeseries_accepts_timestamps_with_offsets(client, bot_id, start, end):
+    response = client.get(f'/analytics/api/bots/{bot_id}/timeseries',
+                          query_string={'bucket': 'hour', 'start': start, 'end': end})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['start'] == '2024-01-01T00:00:00'
+    assert data['end'] == '2024-01-02T00:00:00'
+    assert data['totals'] == {'incoming': 1, 'outgoing': 1}
+
+def test_timeseries_rejects_invalid_timestamps(client, bot_id):
+    response = client.get(f'/analytics/api/bots/{bot_id}/timeseries', query_string={'start': 'yesterday'})
+
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import io
+from models import db
+from models.bot import Bot
+from models.rule import Rule
+from models.user import User
+
+def _login_with_bot(app, client):
+    with app.app_context():
+        user = User(username='owner', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        bot = Bot(user_id=user.id, name='Support', fallback_message='Sorry', retention_days=30)
+        db.session.add(bot)
+        db.session.commit()
+        user_id, bot_id = user.id, bot.id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return bot_id
+
+def _edit(client, bot_id, retention_days):
+    return client.post(f'/bot/{bot_id}/edit', data={
+        'name': 'Support', 'fallback_message': 'Sorry', 'active': 'on', 'retention_days': retention_days
+    })
+
+def test_zero_retention_days_is_rejected(app, client):
+    bot_id = _login_with_bot(app, client)
+
+    for value in ('0', '-5', 'abc'):
+        _edit(client, bot_id, value)
+        with app.app_context():
+            assert db.session.get(Bot, bot_id).retention_days == 30
+
+def test_retention_days_can_be_set_and_cleared(app, client):
+    bot_id = _login_with_bot(app, client)
+
+    _edit(client, bot_id, '7')
+    with app.app_context():
+        assert db.session.get(Bot, bot_id).retention_days == 7
+
+    _edit(client, bot_id, '')
+    with app.app_context():
+        assert db.session.get(Bot, bot_id).retention_days is None
+
+def _import(client, bot_id, text, mode):
+    return client.post(f'/bot/{bot_id}/rules/import', data={
+        'mode': mode, 'rules_file': (io.BytesIO(text.encode()), 'rules.csv')
+    }, content_type='multipart/form-data')
+
+def _keywords(app, bot_id):
+    with app.app_context():
+        return [rule.keyword for rule in Rule.query.filter_by(bot_id=bot_id).order_by(Rule.id)]
+
+def test_replace_import_follows_file_order(app, client):
+    bot_id = _login_with_bot(app, client)
+    _import(client, bot_id, 'keyword,response\nprice,A\nhello,B\n', 'merge')
+
+    _import(client, bot_id, 'keyword,response\nhello,B\nrefund,C\nprice,A\n', 'replace')
+    assert _keywords(app, bot_id) == ['hello', 'refund', 'price']
+
+def test_merge_import_appends_new_rules(app, client):
+    bot_id = _login_with_bot(app, client)
+    _import(client, bot_id, 'keyword,response\nprice,A\n', 'merge')
+
+    _import(client, bot_id, 'keyword,response\nhello,B\nprice,A2\n', 'merge')
+    assert _keywords(app, bot_id) == ['price', 'hello']
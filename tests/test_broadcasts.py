@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from models import db
+from models.broadcast import Broadcast, BroadcastRecipient
+from models.user import User
+from services.broadcast import BroadcastDeferred, BroadcastRunner, broadcast_runner, create_broadcast, run_broadcast
+from services.rate_limit import CircuitOpenError
+from services.whatsapp_service import WhatsAppService
+
+def _login(app, client):
+    with app.app_context():
+        user = User(username='owner', password_hash='x', whatsapp_provider='meta')
+        user.set_meta_credentials('token', '123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def test_json_recipients_may_be_integers(app, client, monkeypatch):
+    _login(app, client)
+    monkeypatch.setattr(broadcast_runner, 'start', lambda broadcast_id: None)
+
+    response = client.post('/broadcasts/', json={'message': 'Hi', 'recipients': [15551234567, '+15557654321']})
+    assert response.status_code == 202
+    with app.app_context():
+        assert sorted(r.phone_number for r in BroadcastRecipient.query) == ['+15557654321', '15551234567']
+
+def test_json_recipients_of_other_types_are_rejected(app, client):
+    _login(app, client)
+
+    for recipients in ([{'number': '15551234567'}], [None], [True], [1.5]):
+        response = client.post('/broadcasts/', json={'message': 'Hi', 'recipients': recipients})
+        assert response.status_code == 400
+        assert response.get_json()['index'] == 0
+
+def _broadcast(app, count):
+    with app.app_context():
+        user = User(username='sender', password_hash='x', whatsapp_provider='meta')
+        user.set_meta_credentials('token', '123')
+        db.session.add(user)
+        db.session.commit()
+        recipients = [f'+1555000{index:04d}' for index in range(count)]
+        return create_broadcast(user, 'Hi', recipients, 'meta').id
+
+def _degraded_provider(monkeypatch, healthy_sends):
+    """Accept ``healthy_sends`` sends, then shed the rest like an open circuit."""
+    calls = []
+    lock = threading.Lock()
+    def send_message(self, to_number, message_body):
+        with lock:
+            calls.append(to_number)
+            if len(calls) > healthy_sends[0]:
+                raise CircuitOpenError('meta sends are paused after repeated failures')
+        return f'wamid.{to_number}'
+    monkeypatch.setattr(WhatsAppService, 'send_message', send_message)
+    return calls
+
+def _statuses(app, broadcast_id):
+    with app.app_context():
+        broadcast = db.session.get(Broadcast, broadcast_id)
+        recipients = BroadcastRecipient.query.filter_by(broadcast_id=broadcast_id)
+        return broadcast.status, broadcast.sent, broadcast.failed, sorted(r.status for r in recipients)
+
+def test_shed_sends_stay_pending_for_a_later_run(app, monkeypatch):
+    broadcast_id = _broadcast(app, 5)
+    healthy_sends = [1]
+    _degraded_provider(monkeypatch, healthy_sends)
+
+    with app.app_context():
+        with pytest.raises(BroadcastDeferred):
+            run_broadcast(broadcast_id, workers=1, batch_size=2)
+    assert _statuses(app, broadcast_id) == ('pending', 1, 0, ['pending'] * 4 + ['sent'])
+
+    healthy_sends[0] = 100
+    with app.app_context():
+        assert run_broadcast(broadcast_id, workers=1, batch_size=2)
+    assert _statuses(app, broadcast_id) == ('completed', 5, 0, ['sent'] * 5)
+
+def test_runner_retries_a_deferred_broadcast(app, monkeypatch):
+    broadcast_id = _broadcast(app, 4)
+    healthy_sends = [2]
+    calls = _degraded_provider(monkeypatch, healthy_sends)
+
+    runner = BroadcastRunner(workers=1, batch_size=2, retry_delay=0.2)
+    runner.app = app
+    done = threading.Event()
+    original_retry = runner._retry
+    def retry(broadcast_id):
+        healthy_sends[0] = 100
+        original_retry(broadcast_id)
+        done.set()
+    monkeypatch.setattr(runner, '_retry', retry)
+
+    runner.start(broadcast_id)
+    assert done.wait(5)
+    for thread in list(runner._threads.values()):
+        thread.join(5)
+    assert _statuses(app, broadcast_id) == ('completed', 4, 0, ['sent'] * 4)
+    # Two sent, two shed, then the two shed ones again
+    assert len(calls) == 6
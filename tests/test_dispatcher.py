@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from benchmarks.provider_stub import StubState, start_stub
+from services import rate_limit, whatsapp_service
+from services.dispatcher import OutboundDispatcher
+from services.rate_limit import FailureBudget, MemoryStore, RateLimiter
+from services.whatsapp_service import WhatsAppService
+
+@pytest.fixture
+def graph(monkeypatch):
+    """A stub Graph API the Meta sends go to; yields its StubState."""
+    servers = []
+
+    def start(**options):
+        state = StubState(**options)
+        server = start_stub(state)
+        servers.append(server)
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        monkeypatch.setenv('META_GRAPH_URL', url)
+        monkeypatch.setattr(whatsapp_service, 'META_GRAPH_URL', url)
+        return state
+
+    monkeypatch.setenv('WHATSAPP_PROVIDER', 'meta')
+    monkeypatch.setenv('META_WHATSAPP_TOKEN', 'stub-token')
+    monkeypatch.setenv('META_PHONE_NUMBER_ID', '100000000000001')
+    monkeypatch.setattr(rate_limit, 'rate_limiter', RateLimiter(MemoryStore()))
+    monkeypatch.setattr(rate_limit, 'failure_budget', FailureBudget())
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    whatsapp_service.evict_clients('env')
+
+def _dispatcher(app, **options):
+    dispatcher = OutboundDispatcher(**options)
+    dispatcher.app = app
+    return dispatcher
+
+def _send(dispatcher, count):
+    service = WhatsAppService()
+    for index in range(count):
+        dispatcher.send_message(service, f'+1555000{index:04d}', 'Hello')
+
+def test_sends_are_queued_and_drained_on_shutdown(app, graph):
+    state = graph(latency=0.1)
+    dispatcher = _dispatcher(app, workers=2, queue_size=100)
+
+    started = time.perf_counter()
+    _send(dispatcher, 6)
+    # Queuing returns at once; the stub takes 0.1s per send
+    assert time.perf_counter() - started < 0.1
+    assert state.counts['requests'] < 6
+
+    dispatcher.shutdown()
+    assert state.counts['accepted'] == 6
+    assert dispatcher.stats() == {
+        'queue_depth': 0, 'in_flight': 0, 'workers': 0, 'sent': 6, 'failed': 0, 'sent_inline': 0
+    }
+
+def test_full_queue_sends_inline(app, graph):
+    state = graph(latency=0.1)
+    dispatcher = _dispatcher(app, workers=1, queue_size=1)
+
+    _send(dispatcher, 4)
+    # One send in the worker and one queued at most; the rest ran inline
+    assert dispatcher.stats()['sent_inline'] >= 2
+
+    dispatcher.shutdown()
+    assert state.counts['accepted'] == 4
+    assert dispatcher.stats()['sent'] == 4
+
+def test_disabled_dispatcher_sends_inline(app, graph):
+    state = graph()
+    dispatcher = _dispatcher(app, workers=2, enabled=False)
+
+    _send(dispatcher, 2)
+    assert state.counts['accepted'] == 2
+    assert dispatcher.stats()['workers'] == 0
+
+def test_stats_count_failed_sends(app, graph, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'RETRY_ATTEMPTS', 1)
+    state = graph(error_rate=1.0)
+    dispatcher = _dispatcher(app, workers=1, queue_size=10)
+
+    _send(dispatcher, 3)
+    assert dispatcher.stats()['workers'] == 1
+
+    dispatcher.shutdown()
+    assert state.counts['errors'] == 3
+    assert dispatcher.stats() == {
+        'queue_depth': 0, 'in_flight': 0, 'workers': 0, 'sent': 0, 'failed': 3, 'sent_inline': 0
+    }
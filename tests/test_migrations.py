@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from sqlalchemy import text
+
+from conftest import ROOT
+from models import db
+from models.migrations import MIGRATIONS, run_migrations
+
+INIT_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from app import create_app
+from models.migrations import init_db
+app = create_app()
+with app.app_context():
+    init_db()
+'''
+
+def test_concurrent_init_db_applies_each_migration_once(tmp_path):
+    database = tmp_path / 'race.db'
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', DB_AUTO_INIT='0',
+               MESSAGE_LOG_ARCHIVE_DIR=str(tmp_path / 'archive'))
+
+    workers = [
+        subprocess.Popen([sys.executable, '-c', INIT_SCRIPT, ROOT], cwd=tmp_path, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(6)
+    ]
+    for worker in workers:
+        _, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr
+
+    versions = [row[0] for row in sqlite3.connect(database).execute('SELECT version FROM schema_migrations')]
+    assert sorted(versions) == [version for version, _, _ in MIGRATIONS]
+
+def test_unique_twilio_number_migration_keeps_one_owner_per_number(app):
+    with app.app_context():
+        # A database migrated up to 5, where migration 4's plain index let two
+        # accounts save the same number
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ux_users_twilio_number_normalized'))
+            conn.execute(text('CREATE INDEX ix_users_twilio_number_normalized ON users (twilio_number_normalized)'))
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = 6'))
+            for user_id, number in ((1, '14155238886'), (2, '14155238886'), (3, None), (4, '14155550000')):
+                conn.execute(text("INSERT INTO users (id, username, password_hash, twilio_number_normalized) "
+                                  "VALUES (:id, :username, 'x', :number)"),
+                             {'id': user_id, 'username': f'user{user_id}', 'number': number})
+
+        assert run_migrations() == [(6, MIGRATIONS[5][1])]
+
+        with db.engine.connect() as conn:
+            numbers = conn.execute(text('SELECT id, twilio_number_normalized FROM users ORDER BY id')).all()
+            indexes = {row[1] for row in conn.execute(text("PRAGMA index_list('users')"))}
+    assert numbers == [(1, '14155238886'), (2, None), (3, None), (4, '14155550000')]
+    assert 'ux_users_twilio_number_normalized' in indexes
+    assert 'ix_users_twilio_number_normalized' not in indexes
@@ -0,0 +1,20 @@
+from sqlalchemy import text
+
+from models import db
+from models.migrations import check_query_plans
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        results = check_query_plans()
+
+    assert results
+    scans = {name: plan for name, plan, uses_index in results if not uses_index}
+    assert not scans, f'hot queries need a full table scan: {scans}'
+
+def test_missing_index_is_reported(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_users_phone_number'))
+        results = {name: uses_index for name, _, uses_index in check_query_plans()}
+
+    assert results['user by phone number'] is False
@@ -0,0 +1,110 @@
+import random
+from time import sleep
+
+import pytest
+import requests
+
+from benchmarks.provider_stub import StubState, start_stub
+from services import rate_limit, whatsapp_service
+from services.rate_limit import CircuitOpenError, FailureBudget, MemoryStore, RateLimiter
+from services.whatsapp_service import WhatsAppService
+
+class ScriptedState(StubState):
+    """Answer with the given statuses in order, then with 200."""
+
+    def __init__(self, statuses, retry_after=1):
+        super().__init__(retry_after=retry_after)
+        self.statuses = list(statuses)
+
+    def outcome(self):
+        with self.lock:
+            self.counts['requests'] += 1
+            status = self.statuses.pop(0) if self.statuses else 200
+            self.counts['accepted' if status == 200 else 'throttled' if status == 429 else 'errors'] += 1
+            return status
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of waiting them out."""
+    recorded = []
+    monkeypatch.setattr(rate_limit.time, 'sleep', recorded.append)
+    return recorded
+
+@pytest.fixture
+def provider(monkeypatch):
+    servers = []
+
+    def start(statuses, retry_after=1):
+        state = ScriptedState(statuses, retry_after)
+        server = start_stub(state)
+        servers.append(server)
+        monkeypatch.setattr(whatsapp_service, 'META_GRAPH_URL', f'http://127.0.0.1:{server.server_address[1]}')
+        return state
+
+    monkeypatch.setenv('WHATSAPP_PROVIDER', 'meta')
+    monkeypatch.setenv('META_WHATSAPP_TOKEN', 'stub-token')
+    monkeypatch.setenv('META_PHONE_NUMBER_ID', '100000000000001')
+    monkeypatch.setattr(rate_limit, 'rate_limiter', RateLimiter(MemoryStore()))
+    monkeypatch.setattr(rate_limit, 'failure_budget', FailureBudget())
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    whatsapp_service.evict_clients('env')
+
+def test_throttled_send_waits_for_retry_after(provider, sleeps):
+    state = provider([429], retry_after=3)
+
+    assert WhatsAppService().send_message('+15551234567', 'Hi') == 'wamid.stub2'
+    assert state.counts['requests'] == 2
+    assert sleeps == [3]
+
+def test_long_retry_after_fails_without_waiting(provider, sleeps):
+    state = provider([429], retry_after=int(rate_limit.RETRY_MAX_DELAY) + 1)
+
+    with pytest.raises(requests.HTTPError):
+        WhatsAppService().send_message('+15551234567', 'Hi')
+    assert state.counts['requests'] == 1
+    assert sleeps == []
+
+def test_server_errors_back_off_with_full_jitter(provider, sleeps, monkeypatch):
+    bounds = []
+    def uniform(low, high):
+        bounds.append((low, high))
+        return random.Random(len(bounds)).uniform(low, high)
+    monkeypatch.setattr(rate_limit.random, 'uniform', uniform)
+    monkeypatch.setattr(rate_limit, 'RETRY_BASE_DELAY', 0.5)
+    monkeypatch.setattr(rate_limit, 'RETRY_ATTEMPTS', 4)
+    state = provider([503, 503, 503, 503])
+
+    with pytest.raises(requests.HTTPError):
+        WhatsAppService().send_message('+15551234567', 'Hi')
+    assert state.counts['requests'] == 4
+    # Each delay is drawn from zero up to a doubling cap, so retries spread out
+    assert bounds[:3] == [(0, 0.5), (0, 1.0), (0, 2.0)]
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= high for delay, (_, high) in zip(sleeps, bounds))
+    assert len(set(sleeps)) == 3
+
+def test_failure_budget_sheds_sends_then_recovers(provider, sleeps, monkeypatch):
+    cooldown = 0.2
+    monkeypatch.setattr(rate_limit, 'failure_budget', FailureBudget(window=60, threshold=0.5, min_calls=4, cooldown=cooldown))
+    monkeypatch.setattr(rate_limit, 'RETRY_ATTEMPTS', 1)
+    state = provider([503, 503, 503, 503])
+    service = WhatsAppService()
+
+    for _ in range(4):
+        with pytest.raises(requests.HTTPError):
+            service.send_message('+15551234567', 'Hi')
+    assert rate_limit.failure_budget.is_open('meta')
+
+    with pytest.raises(CircuitOpenError):
+        service.send_message('+15551234567', 'Hi')
+    assert state.counts['requests'] == 4
+
+    # After the cooldown one trial send goes through and closes the circuit
+    sleep(cooldown)
+    assert service.send_message('+15551234567', 'Hi') == 'wamid.stub5'
+    assert not rate_limit.failure_budget.is_open('meta')
+    assert service.send_message('+15551234567', 'Hi') == 'wamid.stub6'
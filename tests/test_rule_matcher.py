@@ -0,0 +1,64 @@
+import random
+from collections import namedtuple
+
+from models import db
+from models.bot import Bot
+from models.rule import Rule
+from models.user import User
+from services.rule_matcher import RuleMatcher, find_response
+
+RuleRow = namedtuple('RuleRow', ['keyword', 'response'])
+
+def linear_scan(rules, message):
+    """The matching loop the webhooks used before RuleMatcher."""
+    for rule in rules:
+        if rule.keyword.lower() in message.lower():
+            return rule.response
+    return None
+
+def _rules(*keywords):
+    return [RuleRow(keyword, f'{index}:{keyword}') for index, keyword in enumerate(keywords)]
+
+def test_first_rule_wins_on_overlapping_keywords():
+    rules = _rules('order status', 'order', 'status', 'der st', 'a')
+    matcher = RuleMatcher(rules)
+
+    for message in ('What is my order status?', 'status of my order', 'order', 'ORDER', 'der sta', 'nothing here', 'xyz'):
+        assert matcher.match(message) == linear_scan(rules, message)
+    assert matcher.match('my STATUS please') == '2:status'
+    assert matcher.match('Order Status') == '0:order status'
+
+def test_matches_linear_scan_on_random_rules():
+    generator = random.Random(1234)
+    alphabet = 'abAB c'
+    for _ in range(200):
+        keywords = [''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 4)))
+                    for _ in range(generator.randint(1, 8))]
+        rules = _rules(*keywords)
+        matcher = RuleMatcher(rules)
+        for _ in range(20):
+            message = ''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 12)))
+            assert matcher.match(message) == linear_scan(rules, message), (keywords, message)
+
+def test_matcher_is_rebuilt_when_the_bot_version_changes(app):
+    with app.app_context():
+        user = User(username='owner', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        bot = Bot(user_id=user.id, name='Support', fallback_message='Sorry')
+        db.session.add(bot)
+        db.session.flush()
+        rule = Rule(bot_id=bot.id, keyword='price', response='Ten dollars')
+        db.session.add(rule)
+        db.session.commit()
+
+        assert find_response(bot, 'What is the PRICE?') == 'Ten dollars'
+
+        rule.response = 'Twelve dollars'
+        db.session.commit()
+        # Same version: the cached matcher is still served
+        assert find_response(bot, 'price') == 'Ten dollars'
+
+        bot.bump_version()
+        db.session.commit()
+        assert find_response(bot, 'price') == 'Twelve dollars'
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.user import User
+from services.routing import resolve_twilio_number
+
+def _user(username, number=None):
+    user = User(username=username, password_hash='x', whatsapp_provider='twilio')
+    user.set_twilio_credentials('AC' + username, 'token-' + username, number)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def _save_twilio(client, user_id, number):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client.post('/settings', data={
+        'form_type': 'api', 'whatsapp_provider': 'twilio',
+        'twilio_account_sid': 'ACsecond', 'twilio_auth_token': 'token-second',
+        'twilio_whatsapp_number': number
+    })
+
+def test_twilio_number_of_another_account_is_rejected(app, client):
+    with app.app_context():
+        first = _user('first', 'whatsapp:+14155238886')
+        second = _user('second')
+
+    _save_twilio(client, second, '+1 (415) 523-8886')
+
+    with app.app_context():
+        assert db.session.get(User, second).twilio_number_normalized is None
+        assert resolve_twilio_number('whatsapp:+14155238886').user_id == first
+
+    _save_twilio(client, second, 'whatsapp:+14155550000')
+
+    with app.app_context():
+        assert db.session.get(User, second).twilio_number_normalized == '14155550000'
+
+def test_database_rejects_a_shared_twilio_number(app):
+    with app.app_context():
+        _user('first', 'whatsapp:+14155238886')
+        _user('blank')
+        _user('other-blank')
+
+        with pytest.raises(IntegrityError):
+            _user('second', '14155238886')
@@ -0,0 +1,117 @@
+import hashlib
+import hmac
+import json
+
+from sqlalchemy import event
+
+from models import db
+from models.bot import Bot
+from models.message_log import MessageLog
+from models.rule import Rule
+from models.user import User
+from routes import whatsapp
+from services.dispatcher import dispatcher
+
+APP_SECRET = 'test-meta-secret'
+
+def _setup_tenants(app):
+    with app.app_context():
+        for index, keyword in enumerate(('price', 'refund'), 1):
+            user = User(username=f'tenant{index}', password_hash='x', phone_number=f'1555000000{index}')
+            db.session.add(user)
+            db.session.flush()
+            bot = Bot(user_id=user.id, name=f'Bot {index}', fallback_message='Sorry')
+            db.session.add(bot)
+            db.session.flush()
+            db.session.add(Rule(bot_id=bot.id, keyword=keyword, response=f'{keyword} answer'))
+        db.session.commit()
+
+def _message(sender, message_id, body):
+    return {'from': sender, 'id': message_id, 'text': {'body': body}}
+
+def _post(client, entries):
+    body = json.dumps({'entry': [
+        {'changes': [{'value': {'messages': messages}} for messages in changes]} for changes in entries
+    ]}).encode()
+    signature = 'sha256=' + hmac.new(APP_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return client.post('/whatsapp/webhook/meta', data=body, content_type='application/json',
+                       headers={'X-Hub-Signature-256': signature})
+
+def test_batched_meta_delivery_is_handled_as_a_unit(app, client, monkeypatch):
+    monkeypatch.setenv('META_APP_SECRET', APP_SECRET)
+    _setup_tenants(app)
+
+    lookups = []
+    resolve_senders = whatsapp.resolve_senders
+    def counting_resolve(numbers):
+        lookups.append(set(numbers))
+        return resolve_senders(numbers)
+    monkeypatch.setattr(whatsapp, 'resolve_senders', counting_resolve)
+
+    sent = []
+    monkeypatch.setattr(dispatcher, 'send_message', lambda service, to, body: sent.append((to, body)))
+
+    log_inserts = []
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO message_logs'):
+            log_inserts.append(statement)
+
+    entries = [
+        [[_message('15550000001', 'wamid.1', 'price?'), _message('15550000002', 'wamid.2', 'refund')],
+         [_message('15550000001', 'wamid.3', 'other')]],
+        [[_message('15550000002', 'wamid.4', 'price'), _message('15550000003', 'wamid.5', 'hi')]],
+    ]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_inserts)
+        try:
+            response = _post(client, entries)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_inserts)
+
+    assert response.status_code == 200
+    assert lookups == [{'15550000001', '15550000002', '15550000003'}]
+    assert len(log_inserts) == 1
+    assert sorted(sent) == sorted([
+        ('15550000001', 'price answer'),
+        ('15550000002', 'refund answer'),
+        ('15550000001', 'Sorry'),
+        ('15550000002', 'Sorry'),
+        ('15550000003', 'Welcome! Please register on our platform to use this bot service.'),
+    ])
+    with app.app_context():
+        assert MessageLog.query.count() == 8
+
+    # A redelivery of part of the batch, plus one new message
+    sent.clear()
+    response = _post(client, [[[_message('15550000001', 'wamid.1', 'price?'),
+                                _message('15550000002', 'wamid.6', 'refund')]]])
+    assert response.status_code == 200
+    assert sent == [('15550000002', 'refund answer')]
+    with app.app_context():
+        assert MessageLog.query.count() == 10
+
+def test_twilio_exchange_writes_each_log_table_once(app, client, monkeypatch):
+    monkeypatch.delenv('TWILIO_AUTH_TOKEN', raising=False)
+    _setup_tenants(app)
+
+    writes = []
+    def record_writes(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(('INSERT', 'UPDATE')):
+            writes.append(statement.split()[2])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record_writes)
+        try:
+            response = client.post('/whatsapp/webhook/twilio', data={
+                'From': 'whatsapp:+15559999999', 'To': 'whatsapp:+14155238886',
+                'Body': 'price', 'MessageSid': 'SM1'
+            })
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record_writes)
+
+    assert response.status_code == 200
+    assert 'price answer' in response.get_data(as_text=True)
+    for table in ('message_logs', 'message_rollups', 'message_rollup_senders', 'bot_senders'):
+        assert writes.count(table) == 1, writes
+    with app.app_context():
+        assert MessageLog.query.count() == 2
@@ -0,0 +1,47 @@
+import requests
+
+from models import db
+from models.user import User
+from services import whatsapp_service
+from services.whatsapp_service import WhatsAppService
+
+class TrackedSession(requests.Session):
+    def close(self):
+        self.closed = True
+        super().close()
+
+def test_client_registry_closes_least_recently_used(monkeypatch):
+    monkeypatch.setattr(whatsapp_service, 'CLIENT_CACHE_SIZE', 2)
+    whatsapp_service.evict_clients()
+
+    sessions = {owner: TrackedSession() for owner in (1, 2, 3)}
+    for owner in (1, 2):
+        whatsapp_service._get_client('twilio', owner, 'v1', lambda: sessions[owner])
+    # Using owner 1 again makes owner 2 the least recently used
+    assert whatsapp_service._get_client('twilio', 1, 'v1', lambda: TrackedSession()) is sessions[1]
+    whatsapp_service._get_client('twilio', 3, 'v1', lambda: sessions[3])
+
+    assert getattr(sessions[2], 'closed', False)
+    assert not getattr(sessions[1], 'closed', False)
+    assert list(whatsapp_service._clients) == [('twilio', 1), ('twilio', 3)]
+
+    # Changed credentials replace and close the old client
+    whatsapp_service._get_client('twilio', 1, 'v2', TrackedSession)
+    assert getattr(sessions[1], 'closed', False)
+    whatsapp_service.evict_clients()
+    assert getattr(sessions[3], 'closed', False)
+
+def test_meta_tenants_share_one_session(app):
+    whatsapp_service.evict_clients()
+    with app.app_context():
+        services = []
+        for index in range(3):
+            user = User(username=f'tenant{index}', password_hash='x', whatsapp_provider='meta')
+            user.set_meta_credentials(f'token-{index}', f'10000000000000{index}')
+            db.session.add(user)
+            db.session.flush()
+            services.append(WhatsAppService(user))
+
+    assert len({id(service.session) for service in services}) == 1
+    assert [service.access_token for service in services] == ['token-0', 'token-1', 'token-2']
+    assert not whatsapp_service._clients
@@ -1,5 +1,6 @@
 import os
 import base64
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
@@ -13,6 +14,12 @@ def _get_encryption_key():
             'Please set a strong, random secret in your environment variables.'
         )
     
+    return _derive_key(secret)
+
+@lru_cache(maxsize=4)
+def _derive_key(secret):
+    # PBKDF2 with 100k iterations is deliberately slow; derive once per secret
+    # and process instead of on every encrypt/decrypt.
     salt = b'whatsapp_bot_salt'
     
     kdf = PBKDF2HMAC(
@@ -24,12 +31,18 @@ def _get_encryption_key():
     key = base64.urlsafe_b64encode(kdf.derive(secret.encode()))
     return key
 
+@lru_cache(maxsize=4)
+def _fernet_for_key(key):
+    return Fernet(key)
+
+def _get_fernet():
+    return _fernet_for_key(_get_encryption_key())
+
 def encrypt_value(value):
     if not value:
         return None
     
-    key = _get_encryption_key()
-    f = Fernet(key)
+    f = _get_fernet()
     encrypted = f.encrypt(value.encode())
     return base64.urlsafe_b64encode(encrypted).decode('utf-8')
 
@@ -38,8 +51,7 @@ def decrypt_value(encrypted_value):
         return None
     
     try:
-        key = _get_encryption_key()
-        f = Fernet(key)
+        f = _get_fernet()
         encrypted_bytes = base64.urlsafe_b64decode(encrypted_value.encode('utf-8'))
         decrypted = f.decrypt(encrypted_bytes)
         return decrypted.decode('utf-8')
@@ -0,0 +1,62 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import tuple_
+
+# ``before`` and ``after`` are the cursors of the neighbouring pages, or None
+# when there is no page in that direction.
+Page = namedtuple('Page', ['items', 'before', 'after'])
+
+def encode_cursor(values):
+    """Turn a sort key tuple into an opaque, URL-safe cursor."""
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, parsers):
+    """Parse a cursor made by encode_cursor, converting each value with the
+    matching parser. Returns None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            return None
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        return None
+
+def keyset_page(query, columns, key, after=None, before=None, per_page=50, descending=False):
+    """One page of ``query`` ordered by ``columns``, without OFFSET.
+
+    The page starts right after the ``after`` key or ends right before the
+    ``before`` key (both tuples of column values). With an index that
+    matches the filter and ``columns``, every page is a short index range
+    scan however deep it is. ``key(row)`` returns a row's sort key.
+    """
+    forward = before is None
+    cursor = after if forward else before
+    # Walk towards larger keys for an ascending list read forwards, or a
+    # descending list read backwards.
+    ascending = forward != descending
+
+    if cursor is not None:
+        position = tuple_(*columns)
+        query = query.filter(position > cursor if ascending else position < cursor)
+    order = [column.asc() if ascending else column.desc() for column in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+    if not rows:
+        return Page(rows, None, None)
+
+    has_before = cursor is not None if forward else more
+    has_after = more if forward else True
+    return Page(
+        rows,
+        encode_cursor(key(rows[0])) if has_before else None,
+        encode_cursor(key(rows[-1])) if has_after else None
+    )